@@ -0,0 +1,245 @@
+"""
+Benchmarks of rule checking, labeling, features and export on synthetic P2P logs.
+
+Every benchmark is timed on logs of the given numbers of cases, the best of
+``--repeat`` runs, and its peak memory is traced in one more run. Results are
+reduced to a checksum and compared, together with time and memory, against a
+stored baseline::
+
+    python -m benchmarks.bench --cases 10000 100000 1000000
+    python -m benchmarks.bench --cases 10000 --only check_ --update
+
+The exit code is 1 if a benchmark changed its result or got slower or needs more
+memory than the tolerances allow.
+"""
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from conformancelabeler.conformance_checking.rule_check import RuleChecker
+from conformancelabeler.util import log as logutils
+from conformancelabeler.util import metrics
+
+from .synthetic import CI, GR, IR, PO, p2p_log
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+
+# arguments of every check method on the synthetic log
+CHECKS = OrderedDict([
+    ("check_order", (GR, IR)),
+    ("check_response", (IR, CI)),
+    ("check_precedence", (GR, CI)),
+    ("check_exclusive", (GR, "Cancel Goods Receipt")),
+    ("check_cardinality", (GR, 1, 1)),
+    ("check_cardinalities", ([(GR, 1, 1), (IR, 1, 1), (CI, 1, 1)],)),
+    ("check_chain_response", (PO, GR)),
+    ("check_alternate_precedence", (GR, IR)),
+    ("check_not_succession", (IR, GR)),
+    ("check_co_existence", (GR, IR)),
+    ("check_time_elapse", (CI, "Y")),
+    ("check_time_elapse_bpic2018", (CI,)),
+    ("check_max_duration", (PO, CI, "30D")),
+    ("check_deadline", (CI, "60D")),
+    ("check_many", ([("order", GR, IR), ("response", IR, CI), ("precedence", GR, CI),
+                     ("cardinality", GR, 1, 1), ("deadline", CI, "60D")],)),
+])
+
+FEATURES = ("get_event_duration", "get_time_since_last_event", "get_time_since_first_event",
+            "get_cumulative_duration", "get_total_duration", "get_time_attributes",
+            "get_seq_length", "get_event_nr", "get_remaining_time", "compute_time_features")
+
+
+def _check(method: str, args: tuple):
+    def setup(log):
+        rc = RuleChecker(cache=False)
+
+        def run():
+            getattr(rc, method)(log, *args, label=False)
+            return rc.violations, rc.cases, sorted(rc.case_id_dict.items())
+        return run
+    return setup
+
+
+def _label_sequences(log):
+    rc = RuleChecker(cache=False)
+    rc.check_precedence(log, GR, CI, label=False)
+    return lambda: rc.label_sequences(log)
+
+
+def _prefix_reduction(log):
+    rc = RuleChecker(cache=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        log = rc.check_many(log, [("precedence", GR, CI), ("response", IR, CI)])
+    return lambda: rc.prefix_reduction(log)
+
+
+def _feature(name: str):
+    def setup(log):
+        if name == "get_time_attributes":
+            return lambda: metrics.get_time_attributes(log)
+        return lambda: getattr(metrics, name)(log)
+    return setup
+
+
+def _activity_count(log):
+    return lambda: metrics.get_activity_count(log, IR)
+
+
+def _export(name: str):
+    def setup(log):
+        rc = RuleChecker(cache=False)
+        with contextlib.redirect_stdout(io.StringIO()):
+            log = rc.check_precedence(log, GR, CI, label=True, prefix_reduction=True)
+        log = logutils.to_categorical(log, ["concept:name", "org:resource"])
+
+        def run():
+            with tempfile.TemporaryDirectory() as path:
+                getattr(logutils, name)(log, path, ["cost"], ["concept:name", "org:resource"])
+                return np.load(os.path.join(path, "targets.npy"))
+        return run
+    return setup
+
+
+# name, setup returning the benchmarked function, largest number of cases run
+BENCHMARKS = ([(method, _check(method, args), None) for method, args in CHECKS.items()]
+              + [("label_sequences", _label_sequences, None),
+                 ("prefix_reduction", _prefix_reduction, None),
+                 ("get_activity_count", _activity_count, None)]
+              + [(name, _feature(name), None) for name in FEATURES]
+              + [("to_npy", _export("to_npy"), None),
+                 # one boolean selection of the log per case
+                 ("to_pickle", _export("to_pickle"), 10000)])
+
+
+def checksum(result) -> str:
+    """Digest of the result of a benchmark, floats rounded to 6 decimals."""
+    digest = hashlib.blake2b(digest_size=8)
+    if isinstance(result, pd.DataFrame):
+        result = result.round(dict.fromkeys(result.select_dtypes('float').columns, 6))
+        digest.update(repr(list(result.columns)).encode())
+        digest.update(pd.util.hash_pandas_object(result).to_numpy().tobytes())
+    elif isinstance(result, np.ndarray):
+        digest.update(np.ascontiguousarray(result.round(6) if result.dtype.kind == "f" else result)
+                      .tobytes())
+    else:
+        digest.update(repr(result).encode())
+    return digest.hexdigest()
+
+
+def measure(setup, log: pd.DataFrame, repeat=3) -> dict:
+    """Best time of ``repeat`` runs and peak traced memory of another run, each on a copy of the log."""
+    seconds = list()
+    for _ in range(repeat):
+        run = setup(log.copy())
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            result = run()
+            seconds.append(time.perf_counter() - start)
+
+    run = setup(log.copy())
+    tracemalloc.start()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {"seconds": round(min(seconds), 4), "peak_mb": round(peak / 2 ** 20, 2),
+            "checksum": checksum(result)}
+
+
+def compare(results: dict, baseline: dict, time_tolerance=1.5, memory_tolerance=1.2) -> list:
+    """
+    Regressions of the results against the baseline.
+
+    Differences below 50 ms and 1 MB are ignored as noise.
+
+    :return: number of cases, benchmark and description of every regression
+    """
+    regressions = list()
+    for n_cases, benchmarks in results.items():
+        for name, result in benchmarks.items():
+            base = baseline.get(n_cases, dict()).get(name)
+            if base is None:
+                continue
+            if result["checksum"] != base["checksum"]:
+                regressions.append((n_cases, name, "result changed"))
+            if result["seconds"] > base["seconds"] * time_tolerance + 0.05:
+                regressions.append((n_cases, name, "%.3fs instead of %.3fs"
+                                    % (result["seconds"], base["seconds"])))
+            if result["peak_mb"] > base["peak_mb"] * memory_tolerance + 1:
+                regressions.append((n_cases, name, "%.1f MB instead of %.1f MB"
+                                    % (result["peak_mb"], base["peak_mb"])))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--cases", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--only", default=None, help="regular expression selecting benchmarks")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--trace-length", type=float, default=15)
+    parser.add_argument("--activities", type=int, default=20)
+    parser.add_argument("--violation-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--update", action="store_true", help="store the results as baseline")
+    parser.add_argument("--time-tolerance", type=float, default=1.5)
+    parser.add_argument("--memory-tolerance", type=float, default=1.2)
+    args = parser.parse_args(argv)
+
+    config = {"mean_trace_length": args.trace_length, "n_activities": args.activities,
+              "violation_rate": args.violation_rate, "seed": args.seed}
+    stored = {"config": config, "results": dict()}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+    baseline = stored["results"] if stored["config"] == config else dict()
+    if stored["config"] != config:
+        print("Baseline generated with %s, not compared" % stored["config"])
+
+    results = OrderedDict()
+    for n_cases in args.cases:
+        log = p2p_log(n_cases, **config)
+        print("%d cases, %d events" % (n_cases, len(log)))
+        results[str(n_cases)] = OrderedDict()
+        for name, setup, max_cases in BENCHMARKS:
+            if args.only is not None and not re.search(args.only, name):
+                continue
+            if max_cases is not None and n_cases > max_cases:
+                print("  %-28s skipped above %d cases" % (name, max_cases))
+                continue
+            result = measure(setup, log, args.repeat)
+            results[str(n_cases)][name] = result
+            print("  %-28s %9.3fs %10.1f MB  %s" % (name, result["seconds"], result["peak_mb"],
+                                                  result["checksum"]))
+        del log
+
+    regressions = compare(results, baseline, args.time_tolerance, args.memory_tolerance)
+    for n_cases, name, regression in regressions:
+        print("Regression of %s at %s cases: %s" % (name, n_cases, regression))
+
+    if args.update:
+        if stored["config"] != config:
+            stored = {"config": config, "results": dict()}
+        for n_cases, benchmarks in results.items():
+            stored["results"].setdefault(n_cases, dict()).update(benchmarks)
+        with open(args.baseline, "w") as f:
+            json.dump(stored, f, indent=1, sort_keys=True)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""
+Synthetic purchase-to-pay event logs.
+
+Every case creates a purchase order item, records the goods receipt, records the
+invoice receipt and clears the invoice, in this order, interleaved with other
+activities. Violating cases record the invoice before the goods, clear the
+invoice before recording it or miss the goods receipt. Logs are generated with
+array operations only, so logs of millions of events take seconds.
+"""
+import numpy as np
+import pandas as pd
+
+PO = "Create Purchase Order Item"
+GR = "Record Goods Receipt"
+IR = "Record Invoice Receipt"
+CI = "Clear Invoice"
+P2P = (PO, GR, IR, CI)
+
+OTHER = ("Vendor creates invoice", "Change Quantity", "Change Price", "Change Approval for Purchase Order",
+         "Cancel Goods Receipt", "Cancel Invoice Receipt", "Remove Payment Block",
+         "Receive Order Confirmation", "Delete Purchase Order Item", "Change Delivery Indicator",
+         "Record Service Entry Sheet", "Block Purchase Order Item", "SRM: Created", "SRM: Complete")
+
+# order of the P2P activities after the purchase order in violating cases, the last one
+# replaces the goods receipt by another activity
+_VIOLATIONS = ((IR, GR, CI), (GR, CI, IR), (None, IR, CI))
+
+
+def activities(n_activities: int) -> list:
+    """Alphabet of ``n_activities`` activities, the P2P activities first."""
+    n_other = max(n_activities - len(P2P), 1)
+    other = list(OTHER[:n_other]) + ["Activity " + str(i) for i in range(len(OTHER), n_other)]
+    return list(P2P) + other
+
+
+def p2p_log(n_cases=10000, mean_trace_length=15, n_activities=20, violation_rate=0.1, seed=0,
+            n_resources=100, start='2018-01-01', case_id_col='case:concept:name',
+            activity_col='concept:name', timestamp_col='time:timestamp') -> pd.DataFrame:
+    """
+    Synthetic P2P log with the events of every case in order.
+
+    :param mean_trace_length: mean number of events per case, at least 4
+    :param n_activities: size of the activity alphabet, including the 4 P2P activities
+    :param violation_rate: share of cases violating the P2P order
+    :return: log with case, activity, timestamp, resource and cost columns
+    """
+    rng = np.random.default_rng(seed)
+    alphabet = np.array(activities(n_activities), dtype=object)
+    lengths = len(P2P) + rng.poisson(max(mean_trace_length - len(P2P), 0), n_cases)
+    n_events = int(lengths.sum())
+    cases = np.repeat(np.arange(n_cases), lengths)
+    offsets = np.cumsum(lengths) - lengths
+    positions = np.arange(n_events) - offsets[cases]
+
+    codes = rng.integers(len(P2P), len(alphabet), n_events)
+    codes[offsets] = 0
+    # the 3 P2P activities after the purchase order go to 3 random positions of the case,
+    # in order of their positions
+    keys = np.where(positions == 0, np.inf, rng.random(n_events))
+    ranked = np.lexsort((keys, cases))
+    ranks = np.empty(n_events, dtype=np.int64)
+    ranks[ranked] = np.arange(n_events) - offsets[cases[ranked]]
+    chosen = ranks < len(P2P) - 1
+    ordinal = np.cumsum(chosen) - 1
+    ordinal -= (np.cumsum(chosen)[offsets] - chosen[offsets])[cases]
+
+    mapping = np.tile(np.arange(1, len(P2P)), (len(_VIOLATIONS) + 1, 1))
+    for k, order in enumerate(_VIOLATIONS):
+        mapping[k + 1] = [P2P.index(a) if a is not None else len(P2P) for a in order]
+    kind = np.where(rng.random(n_cases) < violation_rate, rng.integers(1, len(mapping), n_cases), 0)
+    codes[chosen] = mapping[kind[cases[chosen]], ordinal[chosen]]
+
+    gaps = rng.exponential(2 * 24 * 3600, n_events).astype(np.int64)
+    gaps[offsets] = rng.integers(0, 365 * 24 * 3600, n_cases)
+    seconds = np.cumsum(gaps)
+    seconds -= (seconds[offsets] - gaps[offsets])[cases]
+    times = pd.Timestamp(start) + pd.to_timedelta(seconds, unit="s")
+
+    return pd.DataFrame({
+        case_id_col: pd.Index(np.arange(n_cases)).map("{:07d}".format).to_numpy()[cases],
+        activity_col: alphabet[codes],
+        timestamp_col: times,
+        "org:resource": "user_" + pd.Series(rng.integers(0, n_resources, n_events)).astype(str),
+        "cost": rng.gamma(2.0, 50.0, n_events).round(2),
+    })
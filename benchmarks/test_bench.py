@@ -0,0 +1,32 @@
+from unittest import TestCase
+
+import pandas as pd
+
+from benchmarks import bench
+from benchmarks.synthetic import CI, GR, IR, P2P, PO, p2p_log
+from conformancelabeler.conformance_checking.rule_check import RuleChecker
+
+
+class TestBenchmarks(TestCase):
+
+	def test_p2p_log(self):
+		log = p2p_log(2000, mean_trace_length=10, n_activities=8, violation_rate=0.2, seed=1)
+		pd.testing.assert_frame_equal(log, p2p_log(2000, mean_trace_length=10, n_activities=8,
+												   violation_rate=0.2, seed=1))
+		self.assertEqual(log['concept:name'].nunique(), 8)
+		self.assertTrue((log.groupby('case:concept:name')['time:timestamp'].diff().dropna() >= pd.Timedelta(0)).all())
+		traces = log[log['concept:name'].isin(P2P)].groupby('case:concept:name')['concept:name'].agg(tuple)
+		self.assertAlmostEqual((traces != P2P).mean(), 0.2, delta=0.03)
+
+		rc = RuleChecker()
+		rc.check_many(log, [('order', GR, IR), ('response', IR, CI)], label=False)
+		self.assertEqual(rc.violations, traces.map(lambda trace: trace == (PO, GR, CI, IR)).sum())
+
+	def test_compare(self):
+		baseline = {'10': {'check_order': {'seconds': 1.0, 'peak_mb': 10.0, 'checksum': 'a'}}}
+		results = {'10': {'check_order': {'seconds': 1.2, 'peak_mb': 10.5, 'checksum': 'a'},
+						  'check_response': {'seconds': 9.0, 'peak_mb': 90.0, 'checksum': 'b'}}}
+		self.assertEqual(bench.compare(results, baseline), [])
+		results['10']['check_order'].update(seconds=2.0, checksum='b')
+		self.assertEqual([regression[:2] for regression in bench.compare(results, baseline)],
+						 [('10', 'check_order')] * 2)
@@ -1 +1,2 @@
 from .rule_check import *
+from .stream import StreamingChecker, Violation
@@ -0,0 +1,262 @@
+"""
+Declare templates compiled into finite automata over int-coded activities.
+
+A template is given by a transition function over small hashable states, where
+every event is reduced to a bit mask of the template activities it matches. The
+reachable states are enumerated once into a NumPy transition table. ``run``
+advances the automata of all rules together, one event position at a time over
+all cases still having an event at that position, so every rule costs a single
+table lookup per event.
+
+Every state tells whether the rule applies to the case, whether the case
+violates the rule, and whether entering it is the point of violation. Violations
+without such a point are labeled at the end of the trace, unless the state marks
+them as not labeled. Results are the same as those of the kernels.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from ..util.trace_index import TraceIndex
+
+Automaton = namedtuple("Automaton", ["activities", "table", "counted", "violated", "marked",
+                                     "unlabeled"])
+
+
+def _compile(activities: tuple, start, step, counted, violated, marked=None, unlabeled=None):
+    """Enumerate the states reachable from ``start`` into a transition table."""
+    n_symbols = 1 << len(activities)
+    states = [start]
+    ids = {start: 0}
+    rows = list()
+    while len(rows) < len(states):
+        row = list()
+        for mask in range(n_symbols):
+            state = step(states[len(rows)], mask)
+            if state not in ids:
+                ids[state] = len(states)
+                states.append(state)
+            row.append(ids[state])
+        rows.append(row)
+
+    def flags(f):
+        return np.array([bool(f(state)) if f is not None else False for state in states])
+
+    return Automaton(tuple(activities), np.array(rows, dtype=np.intp), flags(counted),
+                     flags(violated), flags(marked), flags(unlabeled))
+
+
+def _bound(index: TraceIndex, activity: str) -> int:
+    """Highest number of occurrences of an activity in a case, bounding counting states."""
+    counts = index.activity_counts(activity)
+    return int(counts.max()) if len(counts) else 0
+
+
+def order(index: TraceIndex, first: str, second: str) -> Automaton:
+    # first seen, second seen, second seen before first
+    def step(state, mask):
+        has_first, has_second, second_first = state
+        has_first = has_first or bool(mask & 1)
+        if mask & 2 and not has_second:
+            return has_first, True, not has_first
+        return has_first, has_second, second_first
+
+    return _compile((first, second), (False, False, False), step,
+                    counted=lambda s: s[0] and s[1], violated=lambda s: all(s),
+                    marked=lambda s: s[2])
+
+
+def response(index: TraceIndex, request: str, response: str,
+             single_occurrence=False) -> Automaton:
+    if single_occurrence:
+        # request seen, response seen, last request after the last response
+        def step(state, mask):
+            seen, responded, late = state
+            if mask & 2:
+                return seen or bool(mask & 1), True, False
+            if mask & 1:
+                return True, responded, True
+            return state
+
+        return _compile((request, response), (False, False, False), step,
+                        counted=lambda s: s[0], violated=lambda s: s[0] and (s[2] or not s[1]),
+                        unlabeled=lambda s: not s[1])
+
+    bound = _bound(index, request)
+
+    # request seen, open requests
+    def step(state, mask):
+        seen, open_requests = state
+        if mask & 1:
+            return True, min(open_requests + 1, bound)
+        if mask & 2:
+            return seen, max(open_requests - 1, 0)
+        return state
+
+    return _compile((request, response), (False, 0), step,
+                    counted=lambda s: s[0], violated=lambda s: s[1] > 0)
+
+
+def precedence(index: TraceIndex, preceding: str, request: str,
+               single_occurrence=False) -> Automaton:
+    if single_occurrence:
+        # request seen, preceding activity seen, first request without preceding activity
+        def step(state, mask):
+            seen, preceded, dead = state
+            preceded = preceded or bool(mask & 1)
+            if mask & 2 and not seen:
+                return True, preceded, not preceded
+            return seen, preceded, dead
+
+        return _compile((preceding, request), (False, False, False), step,
+                        counted=lambda s: s[0], violated=lambda s: s[2], marked=lambda s: s[2])
+
+    bound = _bound(index, preceding)
+
+    # request seen, available preceding activities, request without preceding activity
+    def step(state, mask):
+        seen, available, dead = state
+        if dead:
+            return state
+        seen = seen or bool(mask & 2)
+        if mask & 1:
+            return seen, min(available + 1, bound), False
+        if mask & 2:
+            return (seen, 0, True) if available == 0 else (seen, available - 1, False)
+        return seen, available, False
+
+    return _compile((preceding, request), (False, 0, False), step,
+                    counted=lambda s: s[0], violated=lambda s: s[2], marked=lambda s: s[2])
+
+
+def cardinality(index: TraceIndex, activity: str, upper: int, lower: int) -> Automaton:
+    bound = min(max(upper, 0) + 1, max(lower, 0, _bound(index, activity)))
+
+    # occurrences, upper bound exceeded
+    def step(state, mask):
+        count, dead = state
+        if dead or not mask & 1:
+            return state
+        if count + 1 > upper:
+            return count, True
+        return min(count + 1, bound), False
+
+    return _compile((activity,), (0, False), step, counted=lambda s: True,
+                    violated=lambda s: s[1] or s[0] < lower, marked=lambda s: s[1])
+
+
+def exclusive(index: TraceIndex, first_activity: str, second_activity: str) -> Automaton:
+    def step(state, mask):
+        return state[0] or bool(mask & 1), state[1] or bool(mask & 2)
+
+    return _compile((first_activity, second_activity), (False, False), step,
+                    counted=any, violated=all, marked=all)
+
+
+def chain_response(index: TraceIndex, request: str, response: str) -> Automaton:
+    # request seen, response expected by the next event, request not directly followed
+    def step(state, mask):
+        seen, pending, dead = state
+        if dead:
+            return state
+        if pending and not mask & 2:
+            return seen, False, True
+        if mask & 1:
+            return True, True, False
+        return seen, False, False
+
+    return _compile((request, response), (False, False, False), step,
+                    counted=lambda s: s[0], violated=lambda s: s[1] or s[2],
+                    marked=lambda s: s[2])
+
+
+def alternate_precedence(index: TraceIndex, preceding: str, request: str) -> Automaton:
+    # request seen, preceding activity available, request without preceding activity
+    def step(state, mask):
+        seen, available, dead = state
+        if dead:
+            return state
+        available = available or bool(mask & 1)
+        if mask & 2:
+            return (True, False, False) if available else (True, False, True)
+        return seen, available, False
+
+    return _compile((preceding, request), (False, False, False), step,
+                    counted=lambda s: s[0], violated=lambda s: s[2], marked=lambda s: s[2])
+
+
+def not_succession(index: TraceIndex, first: str, second: str) -> Automaton:
+    # first seen, second following the first
+    def step(state, mask):
+        seen, dead = state
+        if dead:
+            return state
+        if mask & 2 and seen:
+            return True, True
+        return seen or bool(mask & 1), False
+
+    return _compile((first, second), (False, False), step,
+                    counted=lambda s: s[0], violated=lambda s: s[1], marked=lambda s: s[1])
+
+
+def co_existence(index: TraceIndex, first_activity: str, second_activity: str) -> Automaton:
+    def step(state, mask):
+        return state[0] or bool(mask & 1), state[1] or bool(mask & 2)
+
+    return _compile((first_activity, second_activity), (False, False), step,
+                    counted=any, violated=lambda s: s[0] != s[1])
+
+
+TEMPLATES = ("order", "response", "precedence", "cardinality", "exclusive", "chain_response",
+             "alternate_precedence", "not_succession", "co_existence")
+
+
+def run(index: TraceIndex, automata: list) -> list:
+    """
+    Advance all automata over the traces of the index in one pass.
+
+    :return: cases the rule applies to, violating cases and point of violation
+    per case for every automaton, like the kernels
+    """
+    n_rules = len(automata)
+    n_states = max(len(a.table) for a in automata)
+    n_symbols = max(a.table.shape[1] for a in automata)
+    rules = np.arange(n_rules)[:, None]
+
+    # symbol of every activity code per rule, the last column for unknown activities
+    symbols = np.zeros((n_rules, len(index.activities) + 1), dtype=np.intp)
+    table = np.zeros((n_rules, n_states, n_symbols), dtype=np.intp)
+    flags = np.zeros((4, n_rules, n_states), dtype=bool)
+    for r, automaton in enumerate(automata):
+        for k, activity in enumerate(automaton.activities):
+            code = index.code(activity)
+            if code >= 0:
+                symbols[r, code] |= 1 << k
+        table[r, :len(automaton.table), :automaton.table.shape[1]] = automaton.table
+        for f, values in enumerate(automaton[2:]):
+            flags[f, r, :len(values)] = values
+
+    # cases sorted by decreasing length, the cases having an event at a position
+    # are a prefix of this order
+    cases = np.argsort(-index.lengths, kind="stable")
+    lengths = index.lengths[cases]
+    starts = index.offsets[:-1][cases]
+    state = np.zeros((n_rules, index.n_cases), dtype=np.intp)
+    mark = np.full((n_rules, index.n_cases), -1, dtype=np.int64)
+    for position in range(int(lengths[0]) if index.n_cases else 0):
+        active = int(np.searchsorted(-lengths, -position, side="left"))
+        codes = index.activity_codes[starts[:active] + position]
+        state[:, :active] = table[rules, state[:, :active], symbols[:, codes]]
+        entered = flags[2][rules, state[:, :active]] & (mark[:, :active] < 0)
+        mark[:, :active][entered] = position
+
+    results = list()
+    final = np.empty_like(state)
+    final[:, cases] = state
+    marks = np.empty_like(mark)
+    marks[:, cases] = mark
+    for r in range(n_rules):
+        counted, violated, marked, unlabeled = flags[:, r, final[r]]
+        position = np.where(marks[r] >= 0, marks[r], np.where(unlabeled, -1, index.lengths))
+        results.append((counted, violated, position))
+    return results
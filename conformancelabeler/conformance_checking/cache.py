@@ -0,0 +1,76 @@
+"""
+Least recently used cache of rule kernel results.
+
+Results are keyed by the fingerprint of the indexed log and the rule with its
+arguments, so a rule checked again on unchanged traces is not evaluated again.
+The cache is bounded by the bytes of the stored arrays. Results dropped from
+memory are written to ``spill_dir`` if given and read back from there on demand.
+The cache can be shared between threads.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+_FIELDS = ("counted", "violated", "position")
+
+
+class ResultCache(object):
+
+    def __init__(self, max_bytes=64 * 2 ** 20, spill_dir=None):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._results = OrderedDict()
+        self._lock = threading.RLock()
+        if spill_dir is not None:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self._results)
+
+    def get(self, key: tuple):
+        """Kernel result stored under ``key``, None if neither in memory nor spilled."""
+        with self._lock:
+            result = self._results.get(key)
+            if result is None and self.spill_dir is not None and os.path.exists(self._path(key)):
+                with np.load(self._path(key)) as spilled:
+                    result = tuple(spilled[field] for field in _FIELDS)
+                self._store(key, result)
+            if result is None:
+                self.misses += 1
+                return None
+            self._results.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key: tuple, result: tuple):
+        result = tuple(np.array(values) for values in result)
+        for values in result:
+            values.flags.writeable = False
+        with self._lock:
+            if key not in self._results:
+                self._store(key, result)
+
+    def clear(self):
+        with self._lock:
+            self._results.clear()
+            self.nbytes = 0
+
+    def _store(self, key: tuple, result: tuple):
+        self._results[key] = result
+        self.nbytes += sum(values.nbytes for values in result)
+        while self.nbytes > self.max_bytes and len(self._results) > 1:
+            old_key, old = self._results.popitem(last=False)
+            self.nbytes -= sum(values.nbytes for values in old)
+            if self.spill_dir is not None and not os.path.exists(self._path(old_key)):
+                tmp = self._path(old_key) + ".tmp.npz"
+                np.savez(tmp, **dict(zip(_FIELDS, old)))
+                os.replace(tmp, self._path(old_key))
+
+    def _path(self, key: tuple) -> str:
+        return os.path.join(self.spill_dir, hashlib.sha1(repr(key).encode()).hexdigest() + ".npz")
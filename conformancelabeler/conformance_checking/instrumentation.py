@@ -0,0 +1,82 @@
+"""
+Records of the stages of rule checking.
+
+Every stage, i.e. grouping the log into a trace index, evaluating rules,
+checking their results, labeling and prefix reduction, produces a record with
+the stage name, the rule if any, the events and cases processed, the violations
+and the seconds spent. While tracemalloc is tracing, records also hold the
+change of allocated bytes. Records are passed to callbacks, collected by
+``Profile`` objects and logged at DEBUG level.
+"""
+import contextlib
+import json
+import logging
+import time
+import tracemalloc
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+@contextlib.contextmanager
+def stage(name: str, sinks: list, **fields):
+    """
+    Record a stage, fields can be added to the yielded record within the stage.
+
+    :param sinks: callables receiving the finished record
+    """
+    record = dict(stage=name, **fields)
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        allocated = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    yield record
+    record["seconds"] = time.perf_counter() - start
+    if tracing:
+        record["memory_delta"] = tracemalloc.get_traced_memory()[0] - allocated
+    for sink in sinks:
+        sink(record)
+    logger.debug("%s", record)
+
+
+class Profile(object):
+    """Records of the stages run while the profile is active, see RuleChecker.profile."""
+
+    def __init__(self):
+        self.records = list()
+
+    def __call__(self, record: dict):
+        self.records.append(record)
+
+    def summary(self) -> pd.DataFrame:
+        """Seconds, runs, events, cases and violations per stage and rule, slowest first."""
+        records = pd.DataFrame(self.records, columns=["stage", "rule", "events", "cases",
+                                                      "violations", "seconds"])
+        records["rule"] = records["rule"].fillna("")
+        return (records.groupby(["stage", "rule"], sort=False)
+                .agg(seconds=("seconds", "sum"), runs=("seconds", "size"), events=("events", "sum"),
+                     cases=("cases", "sum"), violations=("violations", "sum"))
+                .sort_values("seconds", ascending=False, kind="stable").reset_index())
+
+    def to_dict(self) -> dict:
+        """Records and seconds spent per stage."""
+        seconds = dict()
+        for record in self.records:
+            seconds[record["stage"]] = seconds.get(record["stage"], 0.0) + record["seconds"]
+        return {"records": [dict((key, _plain(value)) for key, value in record.items())
+                            for record in self.records],
+                "seconds": seconds}
+
+    def to_json(self, path=None) -> str:
+        """``to_dict`` as JSON, written to ``path`` if given."""
+        text = json.dumps(self.to_dict(), indent=1)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(text)
+        return text
+
+
+def _plain(value):
+    """NumPy scalars as Python numbers for JSON."""
+    return value.item() if hasattr(value, "item") else value
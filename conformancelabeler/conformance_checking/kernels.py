@@ -0,0 +1,171 @@
+"""
+Array kernels of the rules checked by the RuleChecker.
+
+Every kernel evaluates a rule on a TraceIndex and returns three arrays over the
+cases of the index: the cases the rule applies to, the cases violating the rule
+and the point of violation per case (-1 for violations that are not labeled).
+Kernels only read the index, so they can run on any partition of the cases.
+"""
+import numpy as np
+import pandas as pd
+
+from ..util.trace_index import TraceIndex
+from . import automata
+
+
+def cardinality(index: TraceIndex, activity: str, upper: int, lower: int):
+    counts = index.activity_counts(activity)
+    position = np.full(index.n_cases, -1, dtype=np.int64)
+    # the occurrence exceeding the upper bound is the point of violation
+    events = index.activity_events(activity)
+    exceeded = events[index.occurrence_ranks[events] == max(upper, 0) + 1]
+    position[index.case_codes[exceeded]] = index.positions[exceeded]
+    upper_violated = position >= 0
+    # lower cardinality incompliance only gets labeled when the trace is finalized
+    lower_violated = ~upper_violated & (counts < lower)
+    position[lower_violated] = index.lengths[lower_violated]
+    return np.ones(index.n_cases, dtype=bool), upper_violated | lower_violated, position
+
+
+def order(index: TraceIndex, first: str, second: str):
+    counted = index.contains(first) & index.contains(second)
+    # the first occurrence of the second activity must not precede the first one
+    position = index.first_position(index.is_activity(second))
+    violated = counted & (position < index.first_position(index.is_activity(first)))
+    return counted, violated, position
+
+
+def response(index: TraceIndex, request: str, response: str, single_occurrence=False):
+    is_request = index.is_activity(request)
+    is_response = index.is_activity(response)
+    counted = index.contains(request)
+    if single_occurrence:
+        responded = index.contains(response)
+        # a missing response counts as violation but is not labeled
+        late = index.last_position(is_request) > index.last_position(is_response)
+        violated = counted & (late | ~responded)
+        position = np.where(responded, index.lengths, -1)
+    else:
+        # a response consumes one open request, so requests stay open iff some
+        # suffix of the trace holds more requests than responses
+        steps = is_request.astype(np.int64) - (is_response & ~is_request)
+        cumsum = index.grouped_cumsum(steps)
+        suffix = index.grouped_max(steps - cumsum)
+        total = cumsum[index.offsets[1:] - 1] if index.n_cases else cumsum
+        violated = counted & (total + suffix > 0)
+        position = index.lengths
+    return counted, violated, position
+
+
+def precedence(index: TraceIndex, preceding: str, request: str, single_occurrence=False):
+    is_preceding = index.is_activity(preceding)
+    is_request = index.is_activity(request)
+    requested = index.contains(request)
+
+    if single_occurrence:
+        # the first request has to be preceded by the first preceding activity
+        position = index.first_position(is_request)
+        first_preceding = index.first_position(is_preceding, missing=np.iinfo(np.int64).max)
+        violated = requested & (position < first_preceding)
+    else:
+        # every request consumes one preceding activity, the first request
+        # driving the balance negative is the point of violation
+        balance = index.grouped_cumsum(is_preceding.astype(np.int64)
+                                       - (is_request & ~is_preceding))
+        position = index.first_position(balance < 0)
+        violated = position >= 0
+    return requested, violated, position
+
+
+def exclusive(index: TraceIndex, first_activity: str, second_activity: str):
+    has_first = index.contains(first_activity)
+    has_second = index.contains(second_activity)
+    position = np.maximum(index.first_position(index.is_activity(first_activity)),
+                          index.first_position(index.is_activity(second_activity)))
+    return has_first | has_second, has_first & has_second, position
+
+
+# kernels reading the event timestamps of the index
+TIMED = ("time_elapse", "max_duration", "deadline")
+
+
+def _at(index: TraceIndex, values: np.ndarray, position: np.ndarray) -> np.ndarray:
+    """Value of the event at ``position`` per case, positions below zero read the first event."""
+    return values[index.offsets[:-1] + np.maximum(position, 0)]
+
+
+def time_elapse(index: TraceIndex, end_activity: str, period="Y"):
+    periods = index.event_times().view("datetime64[ns]").astype("datetime64[" + period + "]")
+    periods = periods.astype(np.int64)
+    start = _at(index, periods, np.zeros(index.n_cases, dtype=np.int64))
+    last_end = index.last_position(index.is_activity(end_activity))
+    counted = last_end >= 0
+    # the last end activity falls into a later period than the start of the case,
+    # the first event leaving the start period is the point of violation
+    violated = counted & (_at(index, periods, last_end) > start)
+    position = index.first_position(periods != start[index.case_codes])
+    return counted, violated, position
+
+
+def _exceeded(index: TraceIndex, times: np.ndarray, origin: np.ndarray, limit: int):
+    """Latest allowed time per case and the first event after it, following ``origin``."""
+    latest = _at(index, times, origin) + pd.Timedelta(limit).value
+    late = (times > latest[index.case_codes]) & (index.positions > origin[index.case_codes])
+    return latest, index.first_position(late)
+
+
+def max_duration(index: TraceIndex, start_activity: str, end_activity: str, limit):
+    times = index.event_times()
+    first_start = index.first_position(index.is_activity(start_activity))
+    after_start = (first_start[index.case_codes] >= 0) & (index.positions
+                                                           > first_start[index.case_codes])
+    first_end = index.first_position(index.is_activity(end_activity) & after_start)
+    counted = first_end >= 0
+    latest, position = _exceeded(index, times, first_start, limit)
+    violated = counted & (_at(index, times, first_end) > latest)
+    return counted, violated, position
+
+
+def deadline(index: TraceIndex, end_activity: str, limit):
+    times = index.event_times()
+    first_end = index.first_position(index.is_activity(end_activity))
+    counted = first_end >= 0
+    latest, position = _exceeded(index, times, np.full(index.n_cases, -1, dtype=np.int64), limit)
+    violated = counted & (_at(index, times, first_end) > latest)
+    return counted, violated, position
+
+
+def chain_response(index: TraceIndex, request: str, response: str):
+    return automata.run(index, [automata.chain_response(index, request, response)])[0]
+
+
+def alternate_precedence(index: TraceIndex, preceding: str, request: str):
+    return automata.run(index, [automata.alternate_precedence(index, preceding, request)])[0]
+
+
+def not_succession(index: TraceIndex, first: str, second: str):
+    return automata.run(index, [automata.not_succession(index, first, second)])[0]
+
+
+def co_existence(index: TraceIndex, first_activity: str, second_activity: str):
+    return automata.run(index, [automata.co_existence(index, first_activity, second_activity)])[0]
+
+
+def evaluate(index: TraceIndex, rules: list, backend="kernels") -> list:
+    """
+    Results of parsed rules on the index.
+
+    With the ``"automata"`` backend all rules with a template are compiled and
+    advanced together in a single pass over the traces.
+    """
+    results = [None] * len(rules)
+    if backend == "automata":
+        compiled = [(i, getattr(automata, name)(index, *args, **kwargs))
+                    for i, (name, args, kwargs) in enumerate(rules) if name in automata.TEMPLATES]
+        if compiled:
+            for (i, _), result in zip(compiled, automata.run(index, [a for _, a in compiled])):
+                results[i] = result
+    for i, (name, args, kwargs) in enumerate(rules):
+        if results[i] is None:
+            results[i] = globals()[name](index, *args, **kwargs)
+    return results
@@ -0,0 +1,127 @@
+"""
+Evaluation of rule kernels over case partitions in a process or thread pool.
+
+The int-coded activities and case offsets of a TraceIndex, and the event
+timestamps for time rules, are placed in shared memory once, every worker
+attaches to them and rebuilds an index over its own contiguous range of cases. Results are concatenated in partition order, so they
+are identical to a single process run.
+
+Threads build their indexes over views of the arrays of the index instead, the
+log is neither copied nor pickled. Only the "kernels" backend can gain from
+threads: its kernels are NumPy operations over whole arrays, which release the
+GIL for most of their work. The "automata" backend advances its automata in a
+Python loop over the positions of the traces, every step vectorized over the
+cases of the shard reaching that position. The loop holds the GIL between the
+steps, so threads overlap only within the steps and gain little on shards with
+few cases.
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from ..util.trace_index import TraceIndex
+from . import kernels
+
+
+def shard_bounds(index: TraceIndex, n_shards: int) -> list:
+    """Contiguous case ranges holding roughly the same number of events."""
+    targets = np.linspace(0, index.offsets[-1], n_shards + 1)
+    bounds = np.unique(np.searchsorted(index.offsets, targets))
+    bounds[0], bounds[-1] = 0, index.n_cases
+    bounds = np.unique(bounds)
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+
+def evaluate(index: TraceIndex, rules: list, n_jobs: int, backend="kernels") -> list:
+    """
+    Evaluate rule kernels on the cases of the index with ``n_jobs`` processes.
+
+    :param rules: tuples of kernel name, positional and keyword arguments
+    :param backend: see ``kernels.evaluate``
+    :return: kernel result of every rule over all cases
+    """
+    shared = [_share(index.activity_codes), _share(index.offsets)]
+    if any(name in kernels.TIMED for name, _, _ in rules):
+        shared.append(_share(index.event_times()))
+    try:
+        with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+            futures = [pool.submit(_evaluate_shard, shared[0][1], shared[1][1],
+                                   list(index.activities), start, stop, rules, backend,
+                                   shared[2][1] if len(shared) > 2 else None)
+                       for start, stop in shard_bounds(index, n_jobs)]
+            parts = [future.result() for future in futures]
+    finally:
+        for shm, _ in shared:
+            shm.close()
+            shm.unlink()
+    return _concatenate(parts, len(rules))
+
+
+def evaluate_threaded(index: TraceIndex, rules: list, n_jobs: int, backend="kernels") -> list:
+    """
+    Evaluate rule kernels on the cases of the index with ``n_jobs`` threads.
+
+    The index is only read, lazily computed parts of it are not touched, so one
+    index can be evaluated from several threads at once. The "kernels" backend
+    releases the GIL for most of its work, "automata" holds it between the steps of
+    its loop over the trace positions.
+
+    :param rules: tuples of kernel name, positional and keyword arguments
+    :param backend: see ``kernels.evaluate``
+    :return: kernel result of every rule over all cases
+    """
+    times = (index.event_times() if any(name in kernels.TIMED for name, _, _ in rules)
+             else None)
+
+    def evaluate_shard(bounds):
+        shard = _shard(index.activity_codes, index.offsets, index.activities, *bounds, times)
+        return kernels.evaluate(shard, rules, backend)
+
+    with ThreadPoolExecutor(max_workers=n_jobs) as pool:
+        parts = list(pool.map(evaluate_shard, shard_bounds(index, n_jobs)))
+    return _concatenate(parts, len(rules))
+
+
+def _shard(codes: np.ndarray, offsets: np.ndarray, activities, start: int, stop: int,
+           times=None) -> TraceIndex:
+    """Index over the cases ``start`` to ``stop`` on views of the event arrays."""
+    events = slice(offsets[start], offsets[stop])
+    return TraceIndex.from_arrays(codes[events], offsets[start:stop + 1] - offsets[start],
+                                  activities, times=None if times is None else times[events])
+
+
+def _concatenate(parts: list, n_rules: int) -> list:
+    return [tuple(np.concatenate([part[i][j] for part in parts]) for j in range(3))
+            for i in range(n_rules)]
+
+
+def _share(array: np.ndarray):
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)[:] = array
+    return shm, (shm.name, array.shape, array.dtype.str)
+
+
+def _attach(name: str, shape: tuple, dtype: str):
+    shm = shared_memory.SharedMemory(name=name)
+    return shm, np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+
+def _evaluate_shard(codes: tuple, offsets: tuple, activities: list, start: int, stop: int,
+                    rules: list, backend: str, times=None) -> list:
+    codes_shm, all_codes = _attach(*codes)
+    offsets_shm, all_offsets = _attach(*offsets)
+    times_shm, all_times = _attach(*times) if times is not None else (None, None)
+    try:
+        # copied, the shared memory is closed before evaluating
+        events = slice(all_offsets[start], all_offsets[stop])
+        shard_codes = all_codes[events].copy()
+        shard_times = all_times[events].copy() if times_shm is not None else None
+        shard_offsets = all_offsets[start:stop + 1] - all_offsets[start]
+    finally:
+        del all_codes, all_offsets, all_times
+        for shm in (codes_shm, offsets_shm, times_shm):
+            if shm is not None:
+                shm.close()
+    shard = _shard(shard_codes, shard_offsets, activities, 0, len(shard_offsets) - 1, shard_times)
+    return kernels.evaluate(shard, rules, backend)
@@ -0,0 +1,93 @@
+"""
+Immutable results of checked rules.
+
+A ``RuleResult`` holds the outcome of one rule per case of a trace index as
+read-only arrays, so results can be shared between threads, combined, labeled
+and prefix reduced without touching the state of the checker that produced them.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from ..util.trace_index import TraceIndex
+
+
+class RuleResult(namedtuple("RuleResult", ["rule", "name", "message", "index", "counted",
+                                           "violated", "position"])):
+    """
+    Outcome of a rule on the cases of a trace index.
+
+    :param rule: parsed rule, name, arguments and keyword arguments
+    :param name: label column of the rule, e.g. precedence_P_R
+    :param message: report of the check
+    :param index: TraceIndex the rule was evaluated on
+    :param counted: cases the rule applies to
+    :param violated: cases violating the rule
+    :param position: point of violation per case, -1 if the case is not labeled
+
+    The arrays are stored as read-only views.
+    """
+    __slots__ = ()
+
+    def __new__(cls, rule, name, message, index, counted, violated, position):
+        counted = np.asarray(counted, dtype=bool).view()
+        violated = np.asarray(violated, dtype=bool).view()
+        position = np.asarray(position, dtype=np.int64).view()
+        counted.flags.writeable = False
+        violated.flags.writeable = False
+        position.flags.writeable = False
+        return super().__new__(cls, rule, name, message, index, counted, violated, position)
+
+    @property
+    def violations(self) -> int:
+        return int(self.violated.sum())
+
+    @property
+    def cases(self) -> int:
+        return int(self.counted.sum())
+
+    def get_percentage(self) -> float:
+        return round((self.violations / self.cases) * 100, 2)
+
+    @property
+    def case_id_dict(self) -> dict:
+        """Point of violation of every labeled violating case by case id."""
+        return self.index.to_case_dict(self.position >= 0, self.position)
+
+    def positions(self, index: TraceIndex) -> np.ndarray:
+        """Point of violation per case of another index over the same cases, -1 for unknown cases."""
+        if index is self.index or (index.fingerprint is not None
+                                   and index.fingerprint == self.index.fingerprint):
+            return self.position
+        codes = self.index.case_ids.get_indexer(index.case_ids)
+        return np.where(codes >= 0, self.position[codes], -1)
+
+    def label_columns(self, index=None) -> dict:
+        """Label and position column of the rule for the rows of the index, see label_sequences."""
+        index = self.index if index is None else index
+        position = self.positions(index)
+        labeled = position >= 0
+        return {self.name: index.broadcast(labeled.astype(np.int64), fill=0),
+                "Pos_" + self.name: index.broadcast(np.where(labeled, position, index.lengths))}
+
+    @classmethod
+    def combine(cls, results: list, name="any"):
+        """
+        Cases violating any of the results, at their earliest point of violation.
+
+        All results have to be evaluated on the same index.
+        """
+        if any(result.index is not results[0].index for result in results):
+            raise ValueError("Results evaluated on different indexes can not be combined")
+        position = np.stack([np.where(r.position >= 0, r.position, np.iinfo(np.int64).max)
+                             for r in results]).min(axis=0)
+        return cls(("combine", tuple(r.rule for r in results), {}), name, None, results[0].index,
+                   np.logical_or.reduce([r.counted for r in results]),
+                   np.logical_or.reduce([r.violated for r in results]),
+                   np.where(position == np.iinfo(np.int64).max, -1, position))
+
+    def to_frame(self) -> pd.DataFrame:
+        """Applicability, violation and point of violation per case id."""
+        return pd.DataFrame({"counted": self.counted, "violated": self.violated,
+                             "position": self.position}, index=self.index.case_ids)
@@ -1,6 +1,23 @@
 import numpy as np
 import pandas as pd
+import contextlib
+import copy
+import inspect
+import logging
+import os
 import sys
+import tracemalloc
+
+from ..util import partition
+from ..util.prefixes import PrefixView
+from ..util.trace_index import TraceIndex
+from .cache import ResultCache
+from .result import RuleResult
+from . import instrumentation
+from . import kernels
+from . import parallel
+
+logger = logging.getLogger(__name__)
 
 
 class EventLog(object):
@@ -14,8 +31,46 @@ class EventLog(object):
 
 class RuleChecker(EventLog):
 
-    def __init__(self, id="case:concept:name", trace="concept:name", timestamp="time:timestamp"):
+    _batch_rules = ("order", "response", "precedence", "cardinality", "exclusive",
+                    "chain_response", "alternate_precedence", "not_succession", "co_existence",
+                    "time_elapse", "max_duration", "deadline")
+    _variant_ratio = 0.5
+
+    def __init__(self, id="case:concept:name", trace="concept:name", timestamp="time:timestamp",
+                 n_jobs=1, backend="kernels", variants=True, cache=True, callbacks=(),
+                 executor="processes"):
+        """
+        :param n_jobs: number of processes evaluating rules on partitions of the
+        cases, -1 for one process per CPU
+        :param executor: "processes" evaluates partitions in a process pool on
+        shared memory, "threads" in a thread pool on the index itself, which mainly
+        speeds up the "kernels" backend, see parallel
+        :param backend: "kernels" evaluates every rule with its own array kernel,
+        "automata" compiles the rules into automata advanced together in one pass
+        :param variants: evaluate time independent rules once per trace variant
+        and copy the results to the cases of the variant
+        :param cache: ResultCache keeping the results of checked rules, True for a
+        cache with default bounds, None or False to evaluate every rule again
+        :param callbacks: callables receiving the record of every stage, see
+        instrumentation
+
+        ``evaluate`` can be called from several threads on the same checker and
+        log, the ``check_`` methods store their outcome on the checker.
+        """
+        if executor not in ("processes", "threads"):
+            raise ValueError("executor must be 'processes' or 'threads', got '" + str(executor) + "'")
         EventLog.__init__(self, id, trace, timestamp)
+        self.n_jobs = os.cpu_count() if n_jobs == -1 else n_jobs
+        self.backend = backend
+        self.executor = executor
+        self.variants = variants
+        if cache is True:
+            cache = ResultCache()
+        self.cache = cache if isinstance(cache, ResultCache) else None
+        self.callbacks = list(callbacks)
+        self._profiles = list()
+        self._checked_rule = None
+        self._last_index = None
         self.violations = int(0)
         self.cases = int(0)
         self.rule = str()
@@ -27,135 +82,469 @@ class RuleChecker(EventLog):
     def get_percentage(self) -> float:
         return round((self.violations / self.cases) * 100, 2)
 
+    @contextlib.contextmanager
+    def profile(self, memory=False):
+        """
+        Collect the records of all stages run within the block.
+
+        Check messages are logged at INFO and stage records at DEBUG level of the
+        ``conformancelabeler`` loggers.
+
+        :param memory: trace allocations with tracemalloc to record the memory
+        delta of every stage, slows down checking
+        :return: Profile with the records
+        """
+        profile = instrumentation.Profile()
+        started = memory and not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        self._profiles.append(profile)
+        try:
+            yield profile
+        finally:
+            self._profiles.remove(profile)
+            if started:
+                tracemalloc.stop()
+
+    def _stage(self, name: str, **fields):
+        return instrumentation.stage(name, self._profiles + self.callbacks, **fields)
+
+    def build_index(self, log: pd.DataFrame) -> TraceIndex:
+        """
+        Compile a trace index over the checker's columns of the log.
+
+        The index can be passed to every method of the checker in place of the log
+        to avoid encoding the log again for every rule.
+        """
+        return TraceIndex(log, self.id, self.trace, self.timecol)
+
+    def _index(self, log):
+        if isinstance(log, TraceIndex):
+            if (log.id, log.trace) != (self.id, self.trace):
+                raise ValueError("TraceIndex built on columns '" + log.id + "' and '" + log.trace
+                                 + "' but the checker uses '" + self.id + "' and '" + self.trace + "'")
+            return log.log, log.validate()
+        # consecutive checks of the same log share its index while its case and activity
+        # columns are not replaced, values changed in place are noticed by index.refresh()
+        last = self._last_index
+        if (last is None or last.log is not log or (last.id, last.trace, last.timecol)
+                != (self.id, self.trace, self.timecol) or not last.is_current()):
+            with self._stage("grouping", events=len(log)) as record:
+                last = self._last_index = self.build_index(log)
+                record["cases"] = last.n_cases
+        return log, last
+
     def get_compliant_cases(self, log):
-        self.compliant_case_id_dict = dict()
-        incompliant_cases = list(self.case_id_dict.keys())
-        for case_id, events in log.groupby([self.id])[self.trace].apply(list).items():
-            if case_id not in incompliant_cases:
-                self.compliant_case_id_dict[case_id] = len(events)
+        self._compliant_cases(self._index(log)[1])
+
+    def _compliant_cases(self, index: TraceIndex):
+        compliant = ~index.case_ids.isin(list(self.case_id_dict.keys()))
+        self.compliant_case_id_dict = index.to_case_dict(compliant, index.lengths)
 
     def label_sequences(self, log: pd.DataFrame) -> pd.DataFrame:
-        self.get_compliant_cases(log)
-        self.label_name = "_".join([self.rule, self.checked_activity])
-        self.label_list.append(self.label_name)
-        self.pos_name = "_".join(["Pos", self.rule, self.checked_activity])
-        log[self.label_name] = np.where(log[self.id].isin(self.case_id_dict.keys()), 1, 0)
-        log = log.merge(pd.DataFrame({self.id: list(self.case_id_dict.keys())
-                                               + list(self.compliant_case_id_dict.keys()),
-                                      self.pos_name: (list(self.case_id_dict.values())
-                                                      + list(self.compliant_case_id_dict.values()))}),
-                        on=[self.id], how="left")
+        """
+        Add the label and position columns of the last checked rule to the log.
+
+        The columns are written in place, cases are mapped onto the events through
+        their codes in the trace index.
+        """
+        log, index = self._index(log)
+        return self._label_sequences(log, index)
+
+    def _label_sequences(self, log: pd.DataFrame, index: TraceIndex) -> pd.DataFrame:
+        """``label_sequences`` of a log on its already resolved index."""
+        with self._stage("labeling", rule=self._checked_rule, events=len(log), cases=index.n_cases,
+                         violations=self.violations):
+            self._compliant_cases(index)
+            position = np.full(index.n_cases, -1, dtype=np.int64)
+            codes = index.case_ids.get_indexer(list(self.case_id_dict.keys()))
+            found = codes >= 0
+            position[codes[found]] = np.fromiter(self.case_id_dict.values(), dtype=np.int64,
+                                                 count=len(codes))[found]
+            for name, values in self._label_columns(index, position).items():
+                log[name] = values
         return log
 
+    def _label_columns(self, index: TraceIndex, position: np.ndarray) -> dict:
+        """Label and position columns for the point of violation per case, -1 if compliant."""
+        self.label_name = "_".join([self.rule, self.checked_activity])
+        if self.label_name not in self.label_list:
+            self.label_list.append(self.label_name)
+        self.pos_name = "_".join(["Pos", self.rule, self.checked_activity])
+        labeled = position >= 0
+        return {self.label_name: index.broadcast(labeled.astype(np.int64), fill=0),
+                self.pos_name: index.broadcast(np.where(labeled, position, index.lengths))}
 
     def prefix_reduction(self, log: pd.DataFrame, single_rule=False, prefix_reduction=1,
                       min_trace_length=2, max_trace_length=None, drop_help_cols=True,
                       hierarchical=False) -> pd.DataFrame:
-        y_dict = dict()
-        y_pos = dict()
+        log, index = self._index(log)
+        return self._prefix_reduction(log, index, single_rule, prefix_reduction, min_trace_length,
+                                      max_trace_length, drop_help_cols, hierarchical)
+
+    def _prefix_reduction(self, log: pd.DataFrame, index: TraceIndex, single_rule=False,
+                          prefix_reduction=1, min_trace_length=2, max_trace_length=None,
+                          drop_help_cols=True, hierarchical=False) -> pd.DataFrame:
+        """``prefix_reduction`` of a log on its already resolved index."""
+        label_list, pos_cols, y, y_pos = self._prefix_targets(log, index, single_rule, hierarchical)
+        log = self._reduce(log, index, y, y_pos, prefix_reduction, min_trace_length,
+                           max_trace_length, drop_help_cols)
+        if drop_help_cols:
+            log = log.drop(columns=label_list + pos_cols)
+        return log
+
+    def _reduce(self, log: pd.DataFrame, index: TraceIndex, y: np.ndarray, y_pos: np.ndarray,
+                prefix_reduction: int, min_trace_length: int, max_trace_length,
+                drop_help_cols: bool) -> pd.DataFrame:
+        """Cut every case ``prefix_reduction`` events before y_pos and add its target y."""
+        with self._stage("prefix_reduction", events=len(log), cases=index.n_cases) as record:
+            y_pos = index.broadcast(y_pos - prefix_reduction)
+            event_idx = index.event_positions()
+            keep = (y_pos >= min_trace_length) & (event_idx < y_pos)
+            if not max_trace_length is None:
+                keep &= y_pos <= max_trace_length + prefix_reduction
+
+            columns = {"y": index.broadcast(y)[keep]}
+            if not drop_help_cols:
+                columns.update({"y_pos": y_pos[keep], "idx": event_idx[keep]})
+            log = log[keep].assign(**columns)
+            record["events_kept"] = len(log)
+        return log
+
+    def prefix_view(self, log: pd.DataFrame, num_cols=(), cat_cols=(), single_rule=False,
+                    prefix_reduction=1, min_trace_length=2, max_trace_length=None,
+                    hierarchical=False, min_prefix_length=1) -> PrefixView:
+        """
+        Prefixes of the prefix reduced traces without copying them.
+
+        The cases are cut like in ``prefix_reduction``, every case contributes its
+        prefixes of ``min_prefix_length`` up to the cut-off y_pos events as slices
+        into one array of the events sorted by case.
+
+        :param num_cols: numerical features, gathered as float into ``x_num``
+        :param cat_cols: categorical features, gathered as int64 into ``x_cat``
+        :return: PrefixView with the target y of every case
+        """
+        log, index = self._index(log)
+        _, _, y, y_pos = self._prefix_targets(log, index, single_rule, hierarchical)
+        cutoff = y_pos - prefix_reduction
+        keep = cutoff >= min_trace_length
+        if not max_trace_length is None:
+            keep &= cutoff <= max_trace_length + prefix_reduction
+        arrays = {"x_num": log[list(num_cols)].to_numpy(dtype=float)[index.order],
+                  "x_cat": log[list(cat_cols)].to_numpy(dtype=np.int64)[index.order]}
+        return PrefixView(arrays, index.offsets, targets=y, cutoff=np.where(keep, cutoff, 0),
+                          min_length=min_prefix_length, case_ids=index.case_ids)
+
+    def _prefix_targets(self, log: pd.DataFrame, index: TraceIndex, single_rule: bool,
+                        hierarchical: bool) -> tuple:
+        """Label and position columns, target and point of violation y_pos of every case."""
         if single_rule is False:
-            label_list = self.label_list
+            # labels of earlier checks of other logs are not in this log
+            label_list = [label for label in self.label_list if label in log.columns]
         else:
             label_list = [self.label_name]
         pos_cols = list(["Pos_" + str(label) for label in label_list])
-        log2 = log.groupby(self.id).agg(dict(zip(label_list + pos_cols,
-                                                 ["first"] * (len(label_list) * 2))))
-        idx = log2.index
-        rows = log2.values
-
-        if hierarchical:
-            for i, case_id in enumerate(idx):
-                tracked = False
-                row = rows[i]
-                for j, val in enumerate(row[:len(label_list)]):
-                    if val == 1:
-                        y_dict[case_id] = j + 1
-                        y_pos[case_id] = row[len(label_list):][j]
-                        tracked = True
-                        break
-                    if not tracked:
-                        y_dict[case_id] = 0
-                        y_pos[case_id] = np.max(row[len(label_list):])
-        else:
-            for i, case_id in enumerate(idx):
-                row = rows[i]
-                if len(label_list) > 1:
-                    label = row[:len(label_list)]
-                    pos = row[len(label_list):]
-                    if 1 in label:
-                        y_dict[case_id] = 1
-                        y_pos[case_id] = np.min(pos)
-                    else:
-                        y_dict[case_id] = 0
-                        y_pos[case_id] = np.min(pos)
-                else:
-                    y_dict[case_id] = row[0]
-                    y_pos[case_id] = row[1]
-
-        log = log.merge(pd.DataFrame({self.id: y_dict.keys(),
-                                      "y": y_dict.values(),
-                                      "y_pos": y_pos.values()}),
-                        on=[self.id], how="left")
-
-        log["y_pos"] = log.y_pos - prefix_reduction
-        log = log[log["y_pos"] >= min_trace_length]
-        if not max_trace_length is None:
-            log = log[log["y_pos"] <= max_trace_length + prefix_reduction]
-        log["idx"] = 0
-        log["idx"] = log.groupby([self.id])["idx"].cumcount()
-        log = log[log.idx < log.y_pos]
-        if drop_help_cols:
-            log = log.drop(columns=label_list + pos_cols + ["idx", "y_pos"])
+
+        # labels and positions are constant within a case, read them from its first event
+        first_rows = index.order[index.offsets[:-1]]
+        labels = log[label_list].to_numpy()[first_rows]
+        positions = log[pos_cols].to_numpy()[first_rows]
+        return (label_list, pos_cols) + _targets(labels, positions, hierarchical)
+
+    def evaluate(self, log: pd.DataFrame, rules: list) -> list:
+        """
+        Results of rules without changing the state of the checker.
+
+        :param log: event log or TraceIndex
+        :param rules: see ``check_many``
+        :return: RuleResult of every rule
+        """
+        log, index = self._index(log)
+        rules = self._parse_rules(rules)
+        return [self._result(index, rule, result)
+                for rule, result in zip(rules, self._evaluate(index, rules))]
+
+    def _result(self, index: TraceIndex, rule: tuple, result: tuple) -> RuleResult:
+        name, args, kwargs = rule
+        # the _check_ methods name the rule and report on a copy of the checker
+        checker = copy.copy(self)
+        msg, position = checker._check(index, name, *args, result=result, **kwargs)
+        return RuleResult(rule, "_".join([checker.rule, checker.checked_activity]), msg, index,
+                          result[0], result[1], position)
+
+    def label(self, log: pd.DataFrame, results: list) -> pd.DataFrame:
+        """
+        Log with the label and position columns of the results, see label_sequences.
+
+        The log is not changed, results of another log are mapped by case id.
+        """
+        log, index = self._index(log)
+        columns = dict()
+        for result in results:
+            with self._stage("labeling", rule=result.name, events=len(log), cases=index.n_cases,
+                             violations=result.violations):
+                columns.update(result.label_columns(index))
+        return log.assign(**columns)
+
+    def reduce(self, log: pd.DataFrame, results: list, prefix_reduction=1, min_trace_length=2,
+               max_trace_length=None, drop_help_cols=True, hierarchical=False) -> pd.DataFrame:
+        """
+        Prefix reduction of a log by the results, without label columns.
+
+        The same as ``prefix_reduction`` of the log labeled by the results.
+        """
+        log, index = self._index(log)
+        positions = np.stack([result.positions(index) for result in results], axis=1)
+        violated = positions >= 0
+        y, y_pos = _targets(violated.astype(np.int64),
+                            np.where(violated, positions, index.lengths[:, None]), hierarchical)
+        return self._reduce(log, index, y, y_pos, prefix_reduction, min_trace_length,
+                            max_trace_length, drop_help_cols)
+
+    def _set_result(self, index: TraceIndex, counted: np.ndarray, violated: np.ndarray,
+                    position: np.ndarray) -> np.ndarray:
+        """
+        Store the outcome of a rule kernel evaluated on a trace index.
+
+        :param counted: cases the rule applies to
+        :param violated: cases violating the rule
+        :param position: point of violation per case, -1 if the case is not labeled
+        :return: point of violation per case for labeled cases, -1 otherwise
+        """
+        position = np.where(violated, position, -1)
+        self.cases = int(counted.sum())
+        self.violations = int(violated.sum())
+        self.case_id_dict = index.to_case_dict(position >= 0, position)
+        return position
+
+    def _evaluate(self, index: TraceIndex, rules: list) -> list:
+        """Results of the parsed rules, taken from the cache where available."""
+        if self.cache is None or index.fingerprint is None:
+            return self._evaluate_rules(index, rules)
+        keys = [self._cache_key(index, *rule) for rule in rules]
+        results = [self.cache.get(key) for key in keys]
+        missing = [i for i, result in enumerate(results) if result is None]
+        for i, result in zip(missing, self._evaluate_rules(index, [rules[i] for i in missing])):
+            self.cache.put(keys[i], result)
+            results[i] = result
+        return results
+
+    def _cache_key(self, index: TraceIndex, name: str, args, kwargs: dict) -> tuple:
+        # the same rule passed positionally, by keyword or with defaults shares its key
+        arguments = inspect.signature(getattr(kernels, name)).bind(index, *args, **kwargs)
+        arguments.apply_defaults()
+        key = (index.fingerprint, repr((name, list(arguments.arguments.items())[1:])))
+        if name in kernels.TIMED:
+            key += (index.time_fingerprint,)
+        return key
+
+    def _evaluate_rules(self, index: TraceIndex, rules: list) -> list:
+        """
+        Run the kernels of the parsed rules.
+
+        Rules not depending on timestamps are evaluated on the distinct traces of the
+        log if these are at most ``_variant_ratio`` of the cases.
+        """
+        results = dict()
+        on_cases = [i for i, (name, _, _) in enumerate(rules) if name in kernels.TIMED]
+        on_variants = [i for i in range(len(rules)) if i not in on_cases]
+        if self.variants and on_variants:
+            variants, members = index.variants()
+            if variants.n_cases <= self._variant_ratio * index.n_cases:
+                variant_results = self._run(variants, [rules[i] for i in on_variants],
+                                            on="variants")
+                for i, result in zip(on_variants, variant_results):
+                    results[i] = tuple(values[members] for values in result)
+                on_variants = []
+        on_cases = sorted(on_cases + on_variants)
+        for i, result in zip(on_cases, self._run(index, [rules[i] for i in on_cases])):
+            results[i] = result
+        return [results[i] for i in range(len(rules))]
+
+    def _run(self, index: TraceIndex, rules: list, on="cases") -> list:
+        """
+        Evaluate rules on the cases of an index, in a process or thread pool if n_jobs > 1.
+
+        Rules evaluated together, in a process pool or by automata, are recorded as
+        one stage, otherwise every rule is recorded on its own.
+        """
+        if not rules:
+            return []
+        fields = dict(events=len(index.activity_codes), cases=index.n_cases, on=on)
+        if self.n_jobs > 1 and index.n_cases > 1:
+            with self._stage("evaluation", rule=_describe_rules(rules), **fields):
+                if self.executor == "threads":
+                    return parallel.evaluate_threaded(index, rules, self.n_jobs, self.backend)
+                return parallel.evaluate(index, rules, self.n_jobs, self.backend)
+        if self.backend == "automata":
+            with self._stage("evaluation", rule=_describe_rules(rules), **fields):
+                return kernels.evaluate(index, rules, self.backend)
+        results = list()
+        for rule in rules:
+            with self._stage("evaluation", rule=_describe_rules([rule]), **fields):
+                results.append(kernels.evaluate(index, [rule], self.backend)[0])
+        return results
+
+    def _check(self, index: TraceIndex, name: str, *args, result=None, **kwargs):
+        if result is None:
+            result = self._evaluate(index, [(name, args, kwargs)])[0]
+        self._checked_rule = _describe_rules([(name, args, kwargs)])
+        with self._stage("check", rule=self._checked_rule, cases=index.n_cases) as record:
+            checked = getattr(self, "_check_" + name)(index, result, *args, **kwargs)
+            record["violations"] = self.violations
+        return checked
+
+    def _report(self, log: pd.DataFrame, index: TraceIndex, msg: str, label: bool,
+                prefix_reduction: bool, prefix_reduction_size: int, min_trace_length: int,
+                max_trace_length, drop_help_cols: bool):
+        if label:
+            logger.info(msg)
+            log = self._label_sequences(log, index)
+            if prefix_reduction:
+                log = self._prefix_reduction(log, index, single_rule=True,
+                                             prefix_reduction=prefix_reduction_size,
+                                             min_trace_length=min_trace_length,
+                                             max_trace_length=max_trace_length,
+                                             drop_help_cols=drop_help_cols)
+            return log
+        elif not label:
+            return msg
+
+    def check_many(self, log: pd.DataFrame, rules: list, label=True, prefix_reduction=False,
+                   prefix_reduction_size=1, min_trace_length=2, max_trace_length=None,
+                   drop_help_cols=True):
+        """
+        Check several rules against a single encoding of the log.
+
+        Every rule is given as a tuple of the rule name followed by the arguments of
+        the matching ``check_`` method, optionally ending with a dict of keyword
+        arguments, e.g. ``("precedence", "Record Goods Receipt", "Clear Invoice",
+        {"single_occurrence": True})``. A dict with the rule name under ``"rule"``
+        and the arguments as keywords is accepted as well.
+
+        :param log: event log
+        :param rules: order, response, precedence, cardinality, exclusive,
+        chain_response, alternate_precedence, not_succession, co_existence,
+        time_elapse, max_duration or deadline rules
+        :return: log with the label and position columns of all rules, or the
+        reports of all rules if label is False
+        """
+        log, index = self._index(log)
+        rules = self._parse_rules(rules)
+        msgs, columns, _ = self._check_rules(index, rules, label)
+        if not label:
+            return msgs
+        for msg in msgs:
+            logger.info(msg)
+        log[list(columns)] = pd.DataFrame(columns, index=log.index)
+        if prefix_reduction:
+            log = self._prefix_reduction(log, index, prefix_reduction=prefix_reduction_size,
+                                         min_trace_length=min_trace_length,
+                                         max_trace_length=max_trace_length,
+                                         drop_help_cols=drop_help_cols)
         return log
 
+    def _parse_rules(self, rules: list) -> list:
+        rules = [_parse_rule(rule) for rule in rules]
+        for name, _, _ in rules:
+            if name not in self._batch_rules:
+                raise ValueError("Unknown rule '" + str(name) + "', expected one of "
+                                 + ", ".join(self._batch_rules))
+        return rules
+
+    def _check_rules(self, index: TraceIndex, rules: list, label: bool) -> tuple:
+        """Reports, label and position columns, and violations and cases of parsed rules."""
+        msgs = list()
+        columns = dict()
+        counts = list()
+        for (name, args, kwargs), result in zip(rules, self._evaluate(index, rules)):
+            msg, position = self._check(index, name, *args, result=result, **kwargs)
+            msgs.append(msg)
+            counts.append(("_".join([self.rule, self.checked_activity]), self.violations,
+                           self.cases))
+            if label:
+                with self._stage("labeling", rule=self._checked_rule,
+                                 events=len(index.row_case_codes), cases=index.n_cases,
+                                 violations=self.violations):
+                    columns.update(self._label_columns(index, position))
+        return msgs, columns, counts
+
+    def check_partitioned(self, source: str, target: str, rules: list, prefix_reduction=False,
+                          prefix_reduction_size=1, min_trace_length=2, max_trace_length=None,
+                          drop_help_cols=True) -> pd.DataFrame:
+        """
+        Label a log partitioned by case one partition at a time, see util.partition.
+
+        Rules are evaluated per case, so the labeled partitions hold the same rows as
+        ``check_many`` on the complete log, while only one partition is in memory.
+
+        :param source: directory of the partitioned log
+        :param target: directory the labeled partitions are written to
+        :param rules: see ``check_many``
+        :return: violations, cases and percentage of violating cases per rule over
+        all partitions
+        """
+        rules = self._parse_rules(rules)
+        label_list = list(self.label_list)
+        totals = dict()
+        for name, log in partition.iter_partitions(source):
+            self.label_list = list(label_list)
+            log, index = self._index(log)
+            _, columns, counts = self._check_rules(index, rules, label=True)
+            log[list(columns)] = pd.DataFrame(columns, index=log.index)
+            if prefix_reduction:
+                log = self._prefix_reduction(log, index, prefix_reduction=prefix_reduction_size,
+                                             min_trace_length=min_trace_length,
+                                             max_trace_length=max_trace_length,
+                                             drop_help_cols=drop_help_cols)
+            partition.write_partition(log, target, name)
+            for rule, violations, cases in counts:
+                total = totals.get(rule, (0, 0))
+                totals[rule] = (total[0] + violations, total[1] + cases)
+            self._last_index = None
+
+        summary = pd.DataFrame([(rule, violations, cases) for rule, (violations, cases)
+                                in totals.items()], columns=["rule", "violations", "cases"])
+        summary["percentage"] = (summary["violations"] / summary["cases"] * 100).round(2)
+        if len(summary):
+            self.violations, self.cases = (int(summary["violations"].iloc[-1]),
+                                           int(summary["cases"].iloc[-1]))
+        return summary
+
     def check_cardinality(self, log: pd.DataFrame, activity: str, upper: int, lower: int,
                           label=True, prefix_reduction=False,
                           prefix_reduction_size=1, min_trace_length=2,
                           max_trace_length=None, drop_help_cols=True):
+        log, index = self._index(log)
+        msg, _ = self._check(index, "cardinality", activity, upper, lower)
+        return self._report(log, index, msg, label, prefix_reduction, prefix_reduction_size,
+                            min_trace_length, max_trace_length, drop_help_cols)
+
+    def check_cardinalities(self, log: pd.DataFrame, cardinalities: list, label=True,
+                            prefix_reduction=False, prefix_reduction_size=1,
+                            min_trace_length=2, max_trace_length=None, drop_help_cols=True):
+        """
+        Check several cardinality rules from a single count of all activities per case.
+
+        :param log: event log
+        :param cardinalities: tuples of activity, upper and lower bound
+        :return: see ``check_many``
+        """
+        return self.check_many(log, [("cardinality",) + tuple(rule) for rule in cardinalities],
+                               label, prefix_reduction, prefix_reduction_size,
+                               min_trace_length, max_trace_length, drop_help_cols)
+
+    def _check_cardinality(self, index: TraceIndex, result: tuple, activity: str, upper: int,
+                           lower: int):
         self.rule = "cardinality"
         self.checked_activity = "_".join([activity, str(upper), str(lower)])
-        self.cases = 0
-        self.violations = 0
-        self.case_id_dict = dict()
-
-        for case_id, events in log.groupby([self.id])[self.trace].apply(list).items():
-            self.cases += 1
-            tracked = False
-
-            counter = 0
-            for i, event in enumerate(events):
-                if event == activity:
-                    counter += 1
-                    if counter > upper:
-                        if not tracked:
-                            self.violations += 1
-                            self.case_id_dict[case_id] = i
-                            tracked = True
-
-                if counter < lower and i == len(events) - 1 and not tracked:
-                    # lower cardinality incompliance only gets labeled  when the trace is finalized
-                    tracked = True
-                    self.violations += 1
-                    self.case_id_dict[case_id] = len(events)
+        position = self._set_result(index, *result)
 
         msg = ("Conformance checking via cardinality rules of '" + activity
                + "' with " + str(self.violations) + " violations: " + str(self.get_percentage())
                + "% of all cases.")
-
-        if label:
-            print()
-            print(msg)
-            print()
-            log = self.label_sequences(log)
-            if prefix_reduction:
-                log = self.prefix_reduction(log, single_rule=True,
-                                         prefix_reduction=prefix_reduction_size,
-                                         min_trace_length=min_trace_length,
-                                         max_trace_length=max_trace_length,
-                                         drop_help_cols=drop_help_cols)
-            return log
-        elif not label:
-            return msg
+        return msg, position
 
     def check_order(self, log, first: str, second: str, label=True, prefix_reduction=False,
                     prefix_reduction_size=1, min_trace_length=2,
@@ -168,41 +557,20 @@ class RuleChecker(EventLog):
         :param second: activity
         :return: report
         """
+        log, index = self._index(log)
+        msg, _ = self._check(index, "order", first, second)
+        return self._report(log, index, msg, label, prefix_reduction, prefix_reduction_size,
+                            min_trace_length, max_trace_length, drop_help_cols)
+
+    def _check_order(self, index: TraceIndex, result: tuple, first: str, second: str):
         self.rule = "order"
         self.checked_activity = first + "_" + second
-        self.cases = 0
-        self.violations = 0
-        self.case_id_dict = dict()
+        position = self._set_result(index, *result)
 
-        for case_id, events in log.groupby([self.id])[self.trace].apply(list).items():
-            first_stack = []
-            if first in events and second in events:
-                self.cases += 1
-                tracked = False
-                for i, event in enumerate(events):
-                    if event == first:
-                        first_stack.append(event)
-                    elif event == second and len(first_stack) == 0 and not tracked:
-                        tracked = True
-                        self.violations += 1
-                        self.case_id_dict[case_id] = i
         msg = ("Conformance checking via order rule of first '" + first + "' followed by '" + second
                + "' with " + str(self.violations) + " violations: " + str(self.get_percentage())
                + "% of all cases.")
-        if label:
-            print()
-            print(msg)
-            print()
-            log = self.label_sequences(log)
-            if prefix_reduction:
-                log = self.prefix_reduction(log, single_rule=True,
-                                         prefix_reduction=prefix_reduction_size,
-                                         min_trace_length=min_trace_length,
-                                         max_trace_length=max_trace_length,
-                                         drop_help_cols=drop_help_cols)
-            return log
-        elif not label:
-            return msg
+        return msg, position
 
     def check_response(self, log, request: str, response: str,
                        single_occurrence=False, label=True, prefix_reduction=False,
@@ -220,53 +588,21 @@ class RuleChecker(EventLog):
         responding activity already satisfies the rule
         :return: report
         """
+        log, index = self._index(log)
+        msg, _ = self._check(index, "response", request, response, single_occurrence)
+        return self._report(log, index, msg, label, prefix_reduction, prefix_reduction_size,
+                            min_trace_length, max_trace_length, drop_help_cols)
+
+    def _check_response(self, index: TraceIndex, result: tuple, request: str, response: str,
+                        single_occurrence=False):
         self.rule = "response"
         self.checked_activity = request + "_" + response
-        self.cases = 0
-        self.violations = 0
-        self.case_id_dict = dict()
-
-        for case_id, events in log.groupby([self.id])[self.trace].apply(list).items():
-            req_stack = []
-            tracked = False
-            if request in events:
-                self.cases += 1
-                if single_occurrence:
-                    if response in events:
-                        req_idx = events[::-1].index(request)
-                        res_idx = events[::-1].index(response)
-                        if req_idx < res_idx:
-                            self.violations += 1
-                            self.case_id_dict[case_id] = len(events)
-                    else:
-                        self.violations += 1
-                else:
-                    for event in events:
-                        if event == request:
-                            req_stack.append(event)
-                        elif event == response and len(req_stack) > 0:
-                            req_stack.pop()
-                    if len(req_stack) > 0:
-                        self.violations += 1
-                        self.case_id_dict[case_id] = len(events)
+        position = self._set_result(index, *result)
 
         msg = ("Conformance checking via response rules of '" + request + "' requiring '" + response
                + "' with " + str(self.violations) + " violations: " + str(self.get_percentage())
                + "% of all cases.")
-        if label:
-            print()
-            print(msg)
-            print()
-            log = self.label_sequences(log)
-            if prefix_reduction:
-                log = self.prefix_reduction(log, single_rule=True,
-                                         prefix_reduction=prefix_reduction_size,
-                                         min_trace_length=min_trace_length,
-                                         max_trace_length=max_trace_length,
-                                         drop_help_cols=drop_help_cols)
-            return log
-        elif not label:
-            return msg
+        return msg, position
 
     def check_precedence(self, log: pd.DataFrame, preceding: str, request: str,
                          single_occurrence=False, label=False, prefix_reduction=False,
@@ -282,63 +618,21 @@ class RuleChecker(EventLog):
         preceding activity already satisfies the rule
         :return: report
         """
+        log, index = self._index(log)
+        msg, _ = self._check(index, "precedence", preceding, request, single_occurrence)
+        return self._report(log, index, msg, label, prefix_reduction, prefix_reduction_size,
+                            min_trace_length, max_trace_length, drop_help_cols)
 
+    def _check_precedence(self, index: TraceIndex, result: tuple, preceding: str, request: str,
+                          single_occurrence=False):
         self.rule = "precedence"
         self.checked_activity = preceding + "_" + request
-        self.cases = 0
-        self.violations = 0
-        self.case_id_dict = dict()
-
-        for case_id, events in log.groupby([self.id])[self.trace].apply(list).items():
-            if request in events:
-                self.cases += 1
-                tracked = False
-                pre_stack = list()
-                if single_occurrence:
-                    if preceding in events:
-                        request_idx = events.index(request)
-                        preceding_idx = events.index(preceding)
-                        if request_idx < preceding_idx:
-                            self.violations += 1
-                            self.case_id_dict[case_id] = request_idx
-
-
-                    else:
-                        self.violations += 1
-                        request_idx = events.index(request)
-                        self.case_id_dict[case_id] = request_idx
-
-                else:
-                    for i, event in enumerate(events):
-                        if event == preceding:
-                            pre_stack.append(event)
-                        elif event == request and len(pre_stack) > 0:
-                            pre_stack.pop()
-                        elif event == request:
-                            if not tracked:
-                                self.case_id_dict[case_id] =  i
-                                self.violations += 1
-                                tracked = True
-                                break
-
+        position = self._set_result(index, *result)
 
         msg = ("Conformance checking via precedence rules of '" + request + "' requiring '" + preceding
                + "' with " + str(self.violations) + " violations: " + str(self.get_percentage())
                + "% of all cases.")
-        if label:
-            print()
-            print(msg)
-            print()
-            log = self.label_sequences(log)
-            if prefix_reduction:
-                log = self.prefix_reduction(log, single_rule=True,
-                                 prefix_reduction=prefix_reduction_size,
-                                 min_trace_length=min_trace_length,
-                                 max_trace_length=max_trace_length,
-                                 drop_help_cols=drop_help_cols)
-            return log
-        elif not label:
-            return msg
+        return msg, position
 
     def check_exclusive(self, log, first_activity: str, second_activity: str,
                         label=False, prefix_reduction=False, prefix_reduction_size=1, min_trace_length=2,
@@ -352,77 +646,254 @@ class RuleChecker(EventLog):
         :param second_activity: activity
         :return: report
         """
+        log, index = self._index(log)
+        msg, _ = self._check(index, "exclusive", first_activity, second_activity)
+        return self._report(log, index, msg, label, prefix_reduction, prefix_reduction_size,
+                            min_trace_length, max_trace_length, drop_help_cols)
 
+    def _check_exclusive(self, index: TraceIndex, result: tuple, first_activity: str,
+                         second_activity: str):
         self.rule = "precedence"
         self.checked_activity = first_activity + "_" + second_activity
-        self.cases = 0
-        self.violations = 0
-        self.case_id_dict = dict()
+        position = self._set_result(index, *result)
 
-        for case_id, events in log.groupby([self.id])[self.trace].apply(list).items():
-            if first_activity in events or second_activity in events:
-                self.cases += 1
-            if first_activity in events and second_activity in events:
-                self.violations += 1
-                idx = max(events.index(first_activity), events.index(second_activity))
-                self.case_id_dict[case_id] = idx
         msg = ("Conformance checking via exclusiveness rule of '" + first_activity + "' and '" + second_activity
                + "' with " + str(self.violations) + " violations: " + str(self.get_percentage())
                + "% of all cases.")
-        if label:
-            print()
-            print(msg)
-            print()
-            log = self.label_sequences(log)
-            if prefix_reduction:
-                log = self.prefix_reduction(log, single_rule=True,
-                                 prefix_reduction=prefix_reduction_size,
-                                 min_trace_length=min_trace_length,
-                                 max_trace_length=max_trace_length,
-                                 drop_help_cols=drop_help_cols)
-            return log
-        elif not label:
-            return msg
+        return msg, position
+
+    def check_chain_response(self, log, request: str, response: str, label=True,
+                             prefix_reduction=False, prefix_reduction_size=1, min_trace_length=2,
+                             max_trace_length=None, drop_help_cols=True):
+        """
+        Check that every occurrence of an activity is directly followed by another.
+
+        :param log: event log
+        :param request: activity which expects a directly following activity
+        :param response: directly following activity
+        :return: report
+        """
+        log, index = self._index(log)
+        msg, _ = self._check(index, "chain_response", request, response)
+        return self._report(log, index, msg, label, prefix_reduction, prefix_reduction_size,
+                            min_trace_length, max_trace_length, drop_help_cols)
+
+    def _check_chain_response(self, index: TraceIndex, result: tuple, request: str, response: str):
+        self.rule = "chain_response"
+        self.checked_activity = request + "_" + response
+        position = self._set_result(index, *result)
+
+        msg = ("Conformance checking via chain response rules of '" + request + "' requiring '" + response
+               + "' with " + str(self.violations) + " violations: " + str(self.get_percentage())
+               + "% of all cases.")
+        return msg, position
+
+    def check_alternate_precedence(self, log, preceding: str, request: str, label=True,
+                                   prefix_reduction=False, prefix_reduction_size=1, min_trace_length=2,
+                                   max_trace_length=None, drop_help_cols=True):
+        """
+        Check that every occurrence of an activity is preceded by another one without
+        a repetition of the activity in between.
+
+        :param log: event log
+        :param preceding: required preceding activity
+        :param request: activity requiring the preceding activity
+        :return: report
+        """
+        log, index = self._index(log)
+        msg, _ = self._check(index, "alternate_precedence", preceding, request)
+        return self._report(log, index, msg, label, prefix_reduction, prefix_reduction_size,
+                            min_trace_length, max_trace_length, drop_help_cols)
+
+    def _check_alternate_precedence(self, index: TraceIndex, result: tuple, preceding: str,
+                                    request: str):
+        self.rule = "alternate_precedence"
+        self.checked_activity = preceding + "_" + request
+        position = self._set_result(index, *result)
+
+        msg = ("Conformance checking via alternate precedence rules of '" + request
+               + "' requiring '" + preceding + "' with " + str(self.violations) + " violations: "
+               + str(self.get_percentage()) + "% of all cases.")
+        return msg, position
+
+    def check_not_succession(self, log, first: str, second: str, label=True,
+                             prefix_reduction=False, prefix_reduction_size=1, min_trace_length=2,
+                             max_trace_length=None, drop_help_cols=True):
+        """
+        Check that an activity is never followed by another one.
+
+        :param log: event log
+        :param first: activity
+        :param second: activity which must not follow the first one
+        :return: report
+        """
+        log, index = self._index(log)
+        msg, _ = self._check(index, "not_succession", first, second)
+        return self._report(log, index, msg, label, prefix_reduction, prefix_reduction_size,
+                            min_trace_length, max_trace_length, drop_help_cols)
+
+    def _check_not_succession(self, index: TraceIndex, result: tuple, first: str, second: str):
+        self.rule = "not_succession"
+        self.checked_activity = first + "_" + second
+        position = self._set_result(index, *result)
+
+        msg = ("Conformance checking via not succession rules of '" + first + "' and '" + second
+               + "' with " + str(self.violations) + " violations: " + str(self.get_percentage())
+               + "% of all cases.")
+        return msg, position
+
+    def check_co_existence(self, log, first_activity: str, second_activity: str, label=True,
+                           prefix_reduction=False, prefix_reduction_size=1, min_trace_length=2,
+                           max_trace_length=None, drop_help_cols=True):
+        """
+        Check that two activities either both occur or both do not occur.
+
+        :param log: event log
+        :param first_activity: activity
+        :param second_activity: activity
+        :return: report
+        """
+        log, index = self._index(log)
+        msg, _ = self._check(index, "co_existence", first_activity, second_activity)
+        return self._report(log, index, msg, label, prefix_reduction, prefix_reduction_size,
+                            min_trace_length, max_trace_length, drop_help_cols)
+
+    def _check_co_existence(self, index: TraceIndex, result: tuple, first_activity: str,
+                            second_activity: str):
+        self.rule = "co_existence"
+        self.checked_activity = first_activity + "_" + second_activity
+        position = self._set_result(index, *result)
+
+        msg = ("Conformance checking via co-existence rules of '" + first_activity + "' and '" + second_activity
+               + "' with " + str(self.violations) + " violations: " + str(self.get_percentage())
+               + "% of all cases.")
+        return msg, position
 
     def check_time_elapse_bpic2018(self, log, end_activity, label=False,
                                    prefix_reduction=False, prefix_reduction_size=1, min_trace_length=2,
                                    max_trace_length=None, drop_help_cols=True):
+        return self.check_time_elapse(log, end_activity, "Y", label, prefix_reduction,
+                                      prefix_reduction_size, min_trace_length, max_trace_length,
+                                      drop_help_cols)
+
+    def check_time_elapse(self, log, end_activity: str, period="Y", label=True,
+                          prefix_reduction=False, prefix_reduction_size=1, min_trace_length=2,
+                          max_trace_length=None, drop_help_cols=True):
+        """
+        Check that the last occurrence of an activity falls into the calendar period
+        the case started in.
 
+        :param log: event log
+        :param end_activity: activity
+        :param period: calendar period as numpy datetime unit, "Y", "M" or "D"
+        :return: report
+        """
+        log, index = self._index(log)
+        msg, _ = self._check(index, "time_elapse", end_activity, period)
+        return self._report(log, index, msg, label, prefix_reduction, prefix_reduction_size,
+                            min_trace_length, max_trace_length, drop_help_cols)
+
+    def _check_time_elapse(self, index: TraceIndex, result: tuple, end_activity: str,
+                           period="Y"):
         self.rule = "time_elapse"
-        self.checked_activity = end_activity
-        self.cases = 0
-        self.violations = 0
-        self.case_id_dict = dict()
+        self.checked_activity = end_activity if period == "Y" else end_activity + "_" + period
+        position = self._set_result(index, *result)
+
+        msg = ("Time elapse checking of with " + str(self.violations) + " violations: "
+               + str(self.get_percentage()) + "% of all cases.")
+        return msg, position
+
+    def check_max_duration(self, log, start_activity: str, end_activity: str, limit,
+                           label=True, prefix_reduction=False, prefix_reduction_size=1,
+                           min_trace_length=2, max_trace_length=None, drop_help_cols=True):
+        """
+        Check the time between the first occurrence of an activity and the first
+        occurrence of another activity following it.
+
+        :param log: event log
+        :param start_activity: activity starting the duration
+        :param end_activity: activity ending the duration
+        :param limit: maximal duration, anything accepted by pd.Timedelta
+        :return: report
+        """
+        log, index = self._index(log)
+        msg, _ = self._check(index, "max_duration", start_activity, end_activity, limit)
+        return self._report(log, index, msg, label, prefix_reduction, prefix_reduction_size,
+                            min_trace_length, max_trace_length, drop_help_cols)
+
+    def _check_max_duration(self, index: TraceIndex, result: tuple, start_activity: str,
+                            end_activity: str, limit):
+        self.rule = "max_duration"
+        self.checked_activity = "_".join([start_activity, end_activity,
+                                          pd.Timedelta(limit).isoformat()])
+        position = self._set_result(index, *result)
+
+        msg = ("Conformance checking via maximal duration from '" + start_activity + "' to '"
+               + end_activity + "' with " + str(self.violations) + " violations: "
+               + str(self.get_percentage()) + "% of all cases.")
+        return msg, position
+
+    def check_deadline(self, log, end_activity: str, limit, label=True, prefix_reduction=False,
+                       prefix_reduction_size=1, min_trace_length=2, max_trace_length=None,
+                       drop_help_cols=True):
+        """
+        Check the time from the start of a case to the first occurrence of an activity.
 
-        log2 = log[[self.id, self.trace, self.timecol]]
-        log2[self.timecol] = pd.to_datetime(log2[self.timecol])
-        log2[self.timecol] = log2[self.timecol].dt.tz_localize(None)
-
-        for case_id, vals in log2.groupby([self.id]):
-            events = vals[self.trace].tolist()
-            times = vals[self.timecol].dt.year.tolist()
-            if end_activity in events:
-                self.cases += 1
-                start_year = times[0]
-                req_idx = events[::-1].index(end_activity)
-                end_year = times[::-1][req_idx]
-                if end_year > start_year:
-                    self.violations += 1
-                    self.case_id_dict[case_id] = [start_year == year for year in times].index(False)
-
-        msg = ("Time elapse checking of with " + str(self.violations) + " violations: " + str(self.get_percentage())
+        :param log: event log
+        :param end_activity: activity
+        :param limit: deadline after the first event, anything accepted by pd.Timedelta
+        :return: report
+        """
+        log, index = self._index(log)
+        msg, _ = self._check(index, "deadline", end_activity, limit)
+        return self._report(log, index, msg, label, prefix_reduction, prefix_reduction_size,
+                            min_trace_length, max_trace_length, drop_help_cols)
+
+    def _check_deadline(self, index: TraceIndex, result: tuple, end_activity: str, limit):
+        self.rule = "deadline"
+        self.checked_activity = "_".join([end_activity, pd.Timedelta(limit).isoformat()])
+        position = self._set_result(index, *result)
+
+        msg = ("Conformance checking via deadline of '" + end_activity + "' with "
+               + str(self.violations) + " violations: " + str(self.get_percentage())
                + "% of all cases.")
-        if label:
-            print()
-            print(msg)
-            print()
-            log = self.label_sequences(log)
-            if prefix_reduction:
-                log = self.prefix_reduction(log, single_rule=True,
-                                         prefix_reduction=prefix_reduction_size,
-                                         min_trace_length=min_trace_length,
-                                         max_trace_length=max_trace_length,
-                                         drop_help_cols=drop_help_cols)
-            return log
-        elif not label:
-            return msg
+        return msg, position
+
+
+def _targets(labels: np.ndarray, positions: np.ndarray, hierarchical: bool) -> tuple:
+    """
+    Target and point of violation y_pos of every case.
+
+    :param labels: label per case (rows) and rule (columns), 1 if violated
+    :param positions: point of violation per case and rule, the trace length if compliant
+    """
+    cases = np.arange(len(labels))
+    if hierarchical:
+        violated = labels == 1
+        first_violation = violated.argmax(axis=1)
+        tracked = violated.any(axis=1)
+        y = np.where(tracked, first_violation + 1, 0)
+        y_pos = np.where(tracked, positions[cases, first_violation], positions.max(axis=1))
+    elif labels.shape[1] > 1:
+        y = (labels == 1).any(axis=1).astype(np.int64)
+        y_pos = positions.min(axis=1)
+    else:
+        y = labels[:, 0]
+        y_pos = positions[:, 0]
+    return y, y_pos
+
+
+def _describe_rules(rules: list) -> str:
+    """Parsed rules as e.g. "precedence(P, R)", joined by "+"."""
+    return "+".join(name + "(" + ", ".join([str(arg) for arg in args]
+                                           + [key + "=" + str(value) for key, value in kwargs.items()])
+                    + ")" for name, args, kwargs in rules)
+
+
+def _parse_rule(rule):
+    if isinstance(rule, dict):
+        kwargs = dict(rule)
+        return kwargs.pop("rule"), (), kwargs
+    name, *args = rule
+    kwargs = args.pop() if args and isinstance(args[-1], dict) else dict()
+    return name, args, kwargs
@@ -0,0 +1,314 @@
+"""
+Online conformance checking of incoming events.
+
+Every rule keeps a small state per open case that is updated in constant time per
+event. Violations are emitted as soon as they are certain, with the same point
+of violation as the case_id_dict of the RuleChecker. Rules that can only be
+decided on the complete trace (response and lower cardinality) are decided when
+the case is closed. Events of a case are expected in the order of the log.
+"""
+from collections import OrderedDict, namedtuple
+
+from .rule_check import _parse_rule
+
+Violation = namedtuple("Violation", ["case_id", "rule", "position", "timestamp"])
+
+# violation that is counted but has no point of violation, like in the RuleChecker
+_UNLABELED = -1
+
+
+class _Rule(object):
+    """State machine of a rule, ``feed`` and ``close`` return a violation position or None."""
+
+    cases = 0
+    # whether ``feed`` reads the timestamp of the event
+    timed = False
+
+    def start(self) -> list:
+        raise NotImplementedError
+
+    def feed(self, state: list, activity, position: int, timestamp):
+        raise NotImplementedError
+
+    def close(self, state: list, length: int):
+        return None
+
+
+class _Order(_Rule):
+
+    def __init__(self, first: str, second: str):
+        self.name = "_".join(["order", first, second])
+        self.first = first
+        self.second = second
+
+    def start(self):
+        # has first, has second, first position of second without preceding first
+        return [False, False, None]
+
+    def feed(self, state, activity, position, timestamp):
+        counted = state[0] and state[1]
+        if activity == self.first:
+            state[0] = True
+        if activity == self.second and not state[1]:
+            state[1] = True
+            if not state[0]:
+                state[2] = position
+        if state[0] and state[1] and not counted:
+            self.cases += 1
+            if state[2] is not None:
+                return state[2]
+        return None
+
+
+class _Response(_Rule):
+
+    def __init__(self, request: str, response: str, single_occurrence=False):
+        self.name = "_".join(["response", request, response])
+        self.request = request
+        self.response = response
+        self.single_occurrence = single_occurrence
+
+    def start(self):
+        # request seen, open requests or position of the last request, position of the last response
+        return [False, 0, None]
+
+    def feed(self, state, activity, position, timestamp):
+        if activity == self.request and not state[0]:
+            state[0] = True
+            self.cases += 1
+        if self.single_occurrence:
+            if activity == self.request:
+                state[1] = position
+            if activity == self.response:
+                state[2] = position
+        elif activity == self.request:
+            state[1] += 1
+        elif activity == self.response and state[1] > 0:
+            state[1] -= 1
+        return None
+
+    def close(self, state, length):
+        if not state[0]:
+            return None
+        if not self.single_occurrence:
+            return length if state[1] > 0 else None
+        if state[2] is None:
+            return _UNLABELED
+        return length if state[1] > state[2] else None
+
+
+class _Precedence(_Rule):
+
+    def __init__(self, preceding: str, request: str, single_occurrence=False):
+        self.name = "_".join(["precedence", preceding, request])
+        self.preceding = preceding
+        self.request = request
+        self.single_occurrence = single_occurrence
+
+    def start(self):
+        # available preceding activities, request seen
+        return [0, False]
+
+    def feed(self, state, activity, position, timestamp):
+        if activity == self.preceding:
+            state[0] += 1
+        if activity != self.request:
+            return None
+        if not state[1]:
+            state[1] = True
+            self.cases += 1
+            if self.single_occurrence:
+                return None if state[0] else position
+        if self.single_occurrence or activity == self.preceding:
+            return None
+        if state[0] > 0:
+            state[0] -= 1
+            return None
+        return position
+
+
+class _Cardinality(_Rule):
+
+    def __init__(self, activity: str, upper: int, lower: int):
+        self.name = "_".join(["cardinality", activity, str(upper), str(lower)])
+        self.activity = activity
+        self.upper = upper
+        self.lower = lower
+
+    def start(self):
+        self.cases += 1
+        return [0]
+
+    def feed(self, state, activity, position, timestamp):
+        if activity == self.activity:
+            state[0] += 1
+            if state[0] > self.upper:
+                return position
+        return None
+
+    def close(self, state, length):
+        return length if state[0] < self.lower else None
+
+
+class _Exclusive(_Rule):
+
+    def __init__(self, first_activity: str, second_activity: str):
+        # named like the label columns of RuleChecker.check_exclusive
+        self.name = "_".join(["precedence", first_activity, second_activity])
+        self.first_activity = first_activity
+        self.second_activity = second_activity
+
+    def start(self):
+        return [False, False]
+
+    def feed(self, state, activity, position, timestamp):
+        seen = state[0] or state[1]
+        both = state[0] and state[1]
+        if activity == self.first_activity:
+            state[0] = True
+        if activity == self.second_activity:
+            state[1] = True
+        if not seen and (state[0] or state[1]):
+            self.cases += 1
+        if not both and state[0] and state[1]:
+            return position
+        return None
+
+
+class _TimeElapse(_Rule):
+
+    timed = True
+
+    def __init__(self, end_activity: str):
+        self.name = "_".join(["time_elapse", end_activity])
+        self.end_activity = end_activity
+
+    def start(self):
+        # year of the first event, first event in another year, end activity seen
+        return [None, None, False]
+
+    def feed(self, state, activity, position, timestamp):
+        year = timestamp.year
+        if state[0] is None:
+            state[0] = year
+        elif state[1] is None and year != state[0]:
+            state[1] = position
+        if activity == self.end_activity:
+            if not state[2]:
+                state[2] = True
+                self.cases += 1
+            if year > state[0]:
+                return state[1]
+        return None
+
+
+_RULES = {"order": _Order, "response": _Response, "precedence": _Precedence,
+          "cardinality": _Cardinality, "exclusive": _Exclusive, "time_elapse": _TimeElapse}
+
+
+class _Case(object):
+    __slots__ = ("length", "last_seen", "states", "violated")
+
+    def __init__(self, states: list, timestamp):
+        self.length = 0
+        self.last_seen = timestamp
+        self.states = states
+        self.violated = [False] * len(states)
+
+
+class StreamingChecker(object):
+    """
+    Incremental checker of the RuleChecker rules on a stream of events.
+
+    Rules are declared like for ``RuleChecker.check_many``, additionally
+    ``("time_elapse", end_activity)`` is supported. Open cases are closed when one
+    of ``end_activities`` occurs, when no event arrived for ``idle_timeout`` or when
+    more than ``max_cases`` cases are open, so memory stays bounded on long streams.
+
+    ``cases`` and ``violations`` count per rule name like the attributes of the
+    RuleChecker, decided violations are emitted as ``Violation`` tuples.
+    """
+
+    def __init__(self, rules: list, idle_timeout=None, max_cases=None, end_activities=()):
+        self.rules = list()
+        for rule in rules:
+            name, args, kwargs = _parse_rule(rule)
+            if name not in _RULES:
+                raise ValueError("Unknown rule '" + str(name) + "', expected one of "
+                                 + ", ".join(_RULES))
+            self.rules.append(_RULES[name](*args, **kwargs))
+        self.idle_timeout = idle_timeout
+        self.max_cases = max_cases
+        self.end_activities = set(end_activities)
+        self.open_cases = OrderedDict()
+        self.violations = dict((rule.name, 0) for rule in self.rules)
+
+    @property
+    def cases(self) -> dict:
+        return dict((rule.name, rule.cases) for rule in self.rules)
+
+    def feed(self, case_id, activity: str, timestamp=None) -> list:
+        """
+        Process one event.
+
+        :return: violations decided by the event and by cases closed in turn
+        """
+        if timestamp is None and any(rule.timed for rule in self.rules):
+            raise ValueError("Event of case '" + str(case_id) + "' has no timestamp, required by "
+                             + ", ".join(rule.name for rule in self.rules if rule.timed))
+        case = self.open_cases.get(case_id)
+        if case is None:
+            case = _Case([rule.start() for rule in self.rules], timestamp)
+            self.open_cases[case_id] = case
+        else:
+            self.open_cases.move_to_end(case_id)
+            case.last_seen = timestamp
+
+        found = list()
+        for i, rule in enumerate(self.rules):
+            position = rule.feed(case.states[i], activity, case.length, timestamp)
+            if position is not None and not case.violated[i]:
+                found.append(self._violation(case, i, case_id, position, timestamp))
+        case.length += 1
+
+        if activity in self.end_activities:
+            found += self.close(case_id)
+        return found + self.evict(timestamp)
+
+    def close(self, case_id) -> list:
+        """Decide the rules on the completed trace of a case and forget its state."""
+        case = self.open_cases.pop(case_id, None)
+        if case is None:
+            return []
+        found = list()
+        for i, rule in enumerate(self.rules):
+            position = rule.close(case.states[i], case.length)
+            if position is not None and not case.violated[i]:
+                found.append(self._violation(case, i, case_id, position, case.last_seen))
+        return found
+
+    def evict(self, now=None) -> list:
+        """Close cases idle for longer than ``idle_timeout`` and cases above ``max_cases``."""
+        found = list()
+        while self.max_cases is not None and len(self.open_cases) > self.max_cases:
+            found += self.close(next(iter(self.open_cases)))
+        if self.idle_timeout is not None and now is not None:
+            while self.open_cases:
+                case_id, case = next(iter(self.open_cases.items()))
+                if case.last_seen is None or now - case.last_seen <= self.idle_timeout:
+                    break
+                found += self.close(case_id)
+        return found
+
+    def flush(self) -> list:
+        """Close all open cases, e.g. at the end of a stream."""
+        found = list()
+        while self.open_cases:
+            found += self.close(next(iter(self.open_cases)))
+        return found
+
+    def _violation(self, case: _Case, i: int, case_id, position: int, timestamp) -> Violation:
+        case.violated[i] = True
+        name = self.rules[i].name
+        self.violations[name] += 1
+        return Violation(case_id, name, None if position == _UNLABELED else position, timestamp)
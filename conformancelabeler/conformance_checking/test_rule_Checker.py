@@ -1,97 +1,81 @@
 from unittest import TestCase
 
-from conformance_checking.rule_base import Rule_Checker
+import pandas as pd
+
+from conformancelabeler.conformance_checking.rule_check import RuleChecker
+
+
+def to_log(traces: dict) -> pd.DataFrame:
+	return pd.DataFrame([(case_id, event) for case_id, events in traces.items() for event in events],
+						columns=['case:concept:name', 'concept:name'])
 
 
 class TestRule_Checker(TestCase):
 
 	def setUp(self):
-		self.rc = Rule_Checker()
-		self.log = [
-				{'trace': 1, 'events': ['A', 'B', 'D', 'C', 'E']},
-				{'trace': 2, 'events': ['A', 'B', 'D', 'B', 'F']},
-				{'trace': 3, 'events': ['B', 'C', 'E']},
-				{'trace': 4, 'events': ['B', 'E']},
-				{'trace': 5,
-				 'events': ['A', 'B', 'C', 'E', 'C', 'D']}, # single pre
-				{'trace': 6, 'events': ['A', 'C', 'B', 'E', 'C', 'D']},
-				{'trace': 7, 'events': ['G', 'G', 'E', 'T', 'G']},
-			]
+		self.rc = RuleChecker()
+		self.log = to_log({
+			'1': ['A', 'B', 'D', 'C', 'E'],
+			'2': ['A', 'B', 'D', 'B', 'F'],
+			'3': ['B', 'C', 'E'],
+			'4': ['B', 'E'],
+			'5': ['A', 'B', 'C', 'E', 'C', 'D'],  # single pre
+			'6': ['A', 'C', 'B', 'E', 'C', 'D'],
+			'7': ['G', 'G', 'E', 'T', 'G'],
+		})
+
+	def result(self):
+		return self.rc.violations, self.rc.cases, self.rc.get_percentage()
 
 	def test_get_percentage(self):
-		res = self.rc.get_percentage(450, 20)
-		self.assertEqual(res, 4.44)
-
-	def test_export_case_ids(self):
-		ids = ['123', '456', '789']
-		self.rc.export_case_ids('test_ids.txt', ids)
+		self.rc.violations, self.rc.cases = 20, 450
+		self.assertEqual(self.rc.get_percentage(), 4.44)
 
 	def test_check_cardinality(self):
-		res = self.rc.check_cardinality(self.log, 'A', 1, 0)
+		self.rc.check_cardinality(self.log, 'A', 1, 0, label=False)
+		self.assertEqual(self.rc.violations, 0)
 
-		self.assertEqual(res['violation upper'][0], 0)
-		self.assertEqual(res['violation lower'][0], 0)
-
-		res = self.rc.check_cardinality(self.log, 'B', 1, -1)
-		self.assertEqual(res['violation upper'][0], 1)
-		self.assertEqual(res['violation lower'][0], 0)
+		self.rc.check_cardinality(self.log, 'B', 1, -1, label=False)
+		self.assertEqual(self.rc.violations, 1)
+		self.assertEqual(self.rc.case_id_dict, {'2': 3})
 
 	def test_check_order(self):
-		res = self.rc.check_order(self.log, 'A', 'B')
-		self.assertEqual(res['violations'][0], 0)
+		self.rc.check_order(self.log, 'A', 'B', label=False)
+		self.assertEqual(self.rc.violations, 0)
 
 	def test_check_response(self):
-		res = self.rc.check_response(self.log, 'B', 'E')
-		self.assertEqual(res['violations'], (2, 1, 16.67))
+		self.rc.check_response(self.log, 'B', 'E', label=False)
+		self.assertEqual(self.result(), (1, 6, 16.67))
 
-		res = self.rc.check_response(self.log, 'A', 'D')
-		self.assertEqual(res['violations'], (0, 0, 0.0))
+		self.rc.check_response(self.log, 'A', 'D', label=False)
+		self.assertEqual(self.result(), (0, 4, 0.0))
 
-		res = self.rc.check_response(self.log, 'G', 'T', True)
-		self.assertEqual(res['violations'], (1, 1, 100.0))
+		self.rc.check_response(self.log, 'G', 'T', True, label=False)
+		self.assertEqual(self.result(), (1, 1, 100.0))
 
-		res = self.rc.check_response(self.log, 'G', 'T')
-		self.assertEqual(res['violations'], (2, 1, 100.0))
+		self.rc.check_response(self.log, 'G', 'T', label=False)
+		self.assertEqual(self.result(), (1, 1, 100.0))
+		self.assertEqual(self.rc.case_id_dict, {'7': 5})
 
 	def test_check_precedence(self):
-
-		log = [
-			{'trace_id': '1', 'vendor': 'A', 'value': 'a', 'spend_area': 'a', 'item_type': 'a', 'events': ['A', 'B']},
-			{'trace_id': '2', 'vendor': 'A', 'value': 'a', 'spend_area': 'a', 'item_type': 'a', 'events': ['A', 'B', 'R']}, # fail 1
-			{'trace_id': '3', 'vendor': 'A', 'value': 'a', 'spend_area': 'a', 'item_type': 'a', 'events': ['A', 'P', 'B', 'R']}, #t
-			{'trace_id': '4', 'vendor': 'A', 'value': 'a', 'spend_area': 'a', 'item_type': 'a', 'events': ['A', 'R', 'B', 'P']}, # fail 1
-			{'trace_id': '5', 'vendor': 'A', 'value': 'a', 'spend_area': 'a', 'item_type': 'a', 'events': ['A', 'P', 'B', 'P', 'R']}, # t
-			{'trace_id': '6', 'vendor': 'A', 'value': 'a', 'spend_area': 'a', 'item_type': 'a','events': ['A', 'P', 'B', 'R', 'R']}, # fail 1
-			{'trace_id': '7', 'vendor': 'A', 'value': 'a', 'spend_area': 'a', 'item_type': 'a','events': ['A', 'P', 'B', 'P', 'R', 'R']}, # t
-			{'trace_id': '8',  'vendor': 'A', 'value': 'a', 'spend_area': 'a', 'item_type': 'a','events': ['A', 'P']},
-			{'trace_id': '9',  'vendor': 'A', 'value': 'a', 'spend_area': 'a', 'item_type': 'a','events': ['A', 'R', 'P', 'R', 'P']}, # fail 1
-			{'trace_id': '10', 'vendor': 'A', 'value': 'a', 'spend_area': 'a', 'item_type': 'a','events': ['A', 'R', 'R']} # fail 2
-		]
-
-		res = self.rc.check_precedence(log, 'P', 'R')
-		self.assertEqual(res['violations'], (6, 5, 62.5))
-
-	def test_check_precedence_single(self):
-
-		log = [
-			{'trace_id': '1', 'vendor': 'A', 'value': 'a', 'spend_area': 'a', 'item_type': 'a','events': ['A', 'B']},
-			{'trace_id': '2', 'vendor': 'A', 'value': 'a', 'spend_area': 'a', 'item_type': 'a','events': ['A', 'B', 'R']},  # fail 1
-			{'trace_id': '3', 'vendor': 'A', 'value': 'a', 'spend_area': 'a', 'item_type': 'a','events': ['A', 'P', 'B', 'R']},  # t
-			{'trace_id': '4', 'vendor': 'A', 'value': 'a', 'spend_area': 'a', 'item_type': 'a','events': ['A', 'R', 'B', 'P']},  # fail 1
-			{'trace_id': '5', 'vendor': 'A', 'value': 'a', 'spend_area': 'a', 'item_type': 'a','events': ['A', 'P', 'B', 'P', 'R']},  # t
-			{'trace_id': '6', 'vendor': 'A', 'value': 'a', 'spend_area': 'a', 'item_type': 'a','events': ['A', 'P', 'B', 'R', 'R']},  # t
-			{'trace_id': '7', 'vendor': 'A', 'value': 'a', 'spend_area': 'a', 'item_type': 'a','events': ['A', 'P', 'B', 'P', 'R', 'R']},  # t
-			{'trace_id': '8', 'vendor': 'A', 'value': 'a', 'spend_area': 'a', 'item_type': 'a','events': ['A', 'P']},
-			{'trace_id': '9', 'vendor': 'A', 'value': 'a', 'spend_area': 'a', 'item_type': 'a','events': ['A', 'R', 'P', 'R', 'P']}  # fail 1
-		]
-
-		res = self.rc.check_precedence(log, 'P', 'R', True)
-		self.assertEqual(res['violations'], (3, 3, 42.86))
+		log = to_log({
+			'1': ['A', 'B'],
+			'2': ['A', 'B', 'R'],  # fail 1
+			'3': ['A', 'P', 'B', 'R'],  # t
+			'4': ['A', 'R', 'B', 'P'],  # fail 1
+			'5': ['A', 'P', 'B', 'P', 'R'],  # t
+			'6': ['A', 'P', 'B', 'R', 'R'],  # fail 1
+			'7': ['A', 'P', 'B', 'P', 'R', 'R'],  # t
+			'8': ['A', 'P'],
+			'9': ['A', 'R', 'P', 'R', 'P'],  # fail 1
+			'10': ['A', 'R', 'R'],  # fail 2
+		})
+		self.rc.check_precedence(log, 'P', 'R', label=False)
+		self.assertEqual(self.result(), (5, 8, 62.5))
 
 	def test_check_exclusive(self):
-		res = self.rc.check_exclusive(self.log, 'E', 'F')
-		self.assertEqual(res['violations'][0], 0)
-
-		res = self.rc.check_exclusive(self.log, 'A', 'B')
-		self.assertEqual(res['violations'][0], 4)
+		self.rc.check_exclusive(self.log, 'E', 'F', label=False)
+		self.assertEqual(self.rc.violations, 0)
 
+		self.rc.check_exclusive(self.log, 'A', 'B', label=False)
+		self.assertEqual(self.rc.violations, 4)
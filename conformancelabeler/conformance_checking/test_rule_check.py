@@ -0,0 +1,327 @@
+import importlib.util
+import json
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from unittest import TestCase, skipUnless
+
+import pandas as pd
+
+from conformancelabeler.conformance_checking.cache import ResultCache
+from conformancelabeler.conformance_checking.result import RuleResult
+from conformancelabeler.conformance_checking.rule_check import RuleChecker
+from conformancelabeler.util import partition
+
+
+def to_log(traces: dict) -> pd.DataFrame:
+	return pd.DataFrame([(case_id, event) for case_id, events in traces.items() for event in events],
+						columns=['case:concept:name', 'concept:name'])
+
+
+class TestRuleChecker(TestCase):
+
+	def setUp(self):
+		self.rc = RuleChecker()
+		self.log = to_log({
+			'1': ['A', 'B'],
+			'2': ['A', 'B', 'R'],  # fail 2
+			'3': ['A', 'P', 'B', 'R'],
+			'4': ['A', 'R', 'B', 'P'],  # fail 1
+			'5': ['A', 'P', 'B', 'P', 'R'],
+			'6': ['A', 'P', 'B', 'R', 'R'],  # fail 4
+			'7': ['A', 'P', 'B', 'P', 'R', 'R'],
+			'8': ['A', 'P'],
+			'9': ['A', 'R', 'P', 'R', 'P'],  # fail 1
+		})
+
+	def test_check_precedence(self):
+		self.rc.check_precedence(self.log, 'P', 'R')
+		self.assertEqual(self.rc.case_id_dict, {'2': 2, '4': 1, '6': 4, '9': 1})
+		self.assertEqual((self.rc.violations, self.rc.cases), (4, 7))
+
+	def test_check_precedence_single(self):
+		self.rc.check_precedence(self.log, 'P', 'R', single_occurrence=True)
+		self.assertEqual(self.rc.case_id_dict, {'2': 2, '4': 1, '9': 1})
+		self.assertEqual((self.rc.violations, self.rc.cases), (3, 7))
+
+	def test_check_precedence_label(self):
+		log = self.rc.check_precedence(self.log, 'P', 'R', label=True)
+		labels = log.groupby('case:concept:name')[['precedence_P_R', 'Pos_precedence_P_R']].first()
+		self.assertEqual(labels.loc['6'].tolist(), [1, 4])
+		self.assertEqual(labels.loc['1'].tolist(), [0, 2])
+
+	def test_label_sequences_in_place(self):
+		# interleave the cases, keeping the order of events within every case
+		log = self.log.iloc[self.log.groupby('case:concept:name').cumcount().argsort(kind='stable')]
+		log = log.set_axis(range(100, 100 + len(log)))
+		self.rc.check_precedence(log, 'P', 'R')
+		labeled = self.rc.label_sequences(log)
+		self.assertIs(labeled, log)
+		self.assertEqual(labeled.index.tolist(), list(range(100, 100 + len(self.log))))
+		cases = labeled.groupby('case:concept:name')[['precedence_P_R', 'Pos_precedence_P_R']].agg(['min', 'max'])
+		self.assertEqual(cases.loc['6'].tolist(), [1, 1, 4, 4])
+		self.assertEqual(cases.loc['7'].tolist(), [0, 0, 6, 6])
+		self.assertEqual(self.rc.compliant_case_id_dict['1'], 2)
+
+	def test_check_many(self):
+		single = RuleChecker().check_precedence(self.log.copy(), 'P', 'R', label=True)
+		log = self.rc.check_many(self.log, [('precedence', 'P', 'R'),
+											('response', 'P', 'R', {'single_occurrence': True}),
+											('cardinality', 'R', 1, 0)])
+		self.assertEqual(log['Pos_precedence_P_R'].tolist(), single['Pos_precedence_P_R'].tolist())
+		self.assertEqual(self.rc.label_list, ['precedence_P_R', 'response_P_R', 'cardinality_R_1_0'])
+		labels = log.groupby('case:concept:name')[['cardinality_R_1_0', 'Pos_cardinality_R_1_0']].first()
+		self.assertEqual(labels.loc['6'].tolist(), [1, 4])
+
+	def test_check_cardinalities(self):
+		log = self.rc.check_cardinalities(self.log, [('R', 1, 0), ('P', 1, 1), ('B', -1, 0)])
+		labels = log.groupby('case:concept:name')[['Pos_cardinality_R_1_0', 'Pos_cardinality_P_1_1',
+												   'Pos_cardinality_B_-1_0']].first()
+		self.assertEqual(labels.loc['6'].tolist(), [4, 5, 2])
+		self.assertEqual(labels.loc['7'].tolist(), [5, 3, 2])
+		self.assertEqual(labels.loc['1'].tolist(), [2, 2, 1])
+		self.assertEqual((self.rc.violations, self.rc.cases), (7, 9))
+
+	def test_check_time_windows(self):
+		log = pd.DataFrame({'case:concept:name': ['1'] * 4 + ['2'] * 3,
+							'concept:name': ['A', 'B', 'C', 'E', 'A', 'E', 'B'],
+							'time:timestamp': pd.to_datetime(['2017-12-30', '2017-12-31', '2018-01-02',
+															  '2018-01-03', '2018-03-01', '2018-03-02',
+															  '2018-03-10'])})
+		self.rc.check_time_elapse_bpic2018(log, 'E')
+		self.assertEqual((self.rc.case_id_dict, self.rc.cases), ({'1': 2}, 2))
+		self.rc.check_max_duration(log, 'A', 'B', '2D', label=False)
+		self.assertEqual((self.rc.case_id_dict, self.rc.cases), ({'2': 2}, 2))
+		self.rc.check_deadline(log, 'E', '3D', label=False)
+		self.assertEqual((self.rc.case_id_dict, self.rc.cases), ({'1': 3}, 2))
+
+	def test_declare_templates(self):
+		self.rc.check_chain_response(self.log, 'P', 'B', label=False)
+		self.assertEqual(self.rc.case_id_dict, {'4': 4, '5': 4, '7': 4, '8': 2, '9': 3})
+		self.rc.check_alternate_precedence(self.log, 'P', 'R', label=False)
+		self.assertEqual(self.rc.case_id_dict, {'2': 2, '4': 1, '6': 4, '7': 5, '9': 1})
+		self.rc.check_not_succession(self.log, 'R', 'P', label=False)
+		self.assertEqual(self.rc.case_id_dict, {'4': 3, '9': 2})
+		self.rc.check_co_existence(self.log, 'P', 'R', label=False)
+		self.assertEqual(self.rc.case_id_dict, {'2': 3, '8': 2})
+
+	def test_automata_backend(self):
+		rules = [('precedence', 'P', 'R'), ('response', 'P', 'R', {'single_occurrence': True}),
+				 ('order', 'R', 'P'), ('cardinality', 'R', 1, 1), ('exclusive', 'B', 'R'),
+				 ('chain_response', 'P', 'B')]
+		kernels = self.rc.check_many(self.log.copy(), rules)
+		rc = RuleChecker(backend='automata')
+		automata = rc.check_many(self.log.copy(), rules)
+		pd.testing.assert_frame_equal(kernels, automata)
+
+	def test_trace_variants(self):
+		log = pd.concat([self.log, self.log.assign(**{'case:concept:name': self.log['case:concept:name'] + 'b'})])
+		variants, members = self.rc.build_index(log).variants()
+		self.assertEqual(variants.n_cases, 9)
+		self.assertEqual(members.tolist(), [i for i in range(9) for _ in range(2)])
+		rules = [('precedence', 'P', 'R'), ('cardinality', 'R', 1, 0), ('chain_response', 'P', 'B')]
+		deduplicated = self.rc.check_many(log.copy(), rules)
+		pd.testing.assert_frame_equal(deduplicated, RuleChecker(variants=False).check_many(log.copy(), rules))
+		self.assertEqual(self.rc.case_id_dict, {'4': 4, '4b': 4, '5': 4, '5b': 4, '7': 4, '7b': 4,
+												'8': 2, '8b': 2, '9': 3, '9b': 3})
+
+	def test_trace_variants_hash_collision(self):
+		# a Thue-Morse sequence and its complement have the same polynomial hashes
+		thue_morse = [bin(i).count('1') % 2 for i in range(2048)]
+		trace = ['PR'[bit] for bit in thue_morse]
+		complement = ['RP'[bit] for bit in thue_morse]
+		log = to_log({'A': trace, 'B': complement, 'C': trace, 'D': complement})
+		variants, members = self.rc.build_index(log).variants()
+		self.assertEqual((variants.n_cases, members.tolist()), (2, [0, 1, 0, 1]))
+		self.rc.check_precedence(log, 'P', 'R', label=False)
+		self.assertEqual(self.rc.case_id_dict, {'A': 2, 'B': 0, 'C': 2, 'D': 0})
+
+	def test_result_cache(self):
+		self.rc.check_precedence(self.log, 'P', 'R', label=False)
+		log = self.rc.check_precedence(self.log, 'P', 'R', label=True)
+		self.assertEqual((self.rc.cache.hits, self.rc.cache.misses), (1, 1))
+		self.assertEqual(log.groupby('case:concept:name')['Pos_precedence_P_R'].first().loc['6'], 4)
+		self.log['concept:name'] = self.log['concept:name'].mask(self.log['case:concept:name'] == '6', 'P')
+		self.rc.check_precedence(self.log, 'P', 'R', label=False)
+		self.assertEqual(self.rc.case_id_dict, {'2': 2, '4': 1, '9': 1})
+		self.assertEqual(self.rc.cache.misses, 2)
+
+	def test_result_cache_normalized_rules(self):
+		self.rc.check_precedence(self.log, 'P', 'R', False, label=False)
+		self.rc.check_many(self.log, [('precedence', 'P', 'R'), {'rule': 'precedence', 'preceding': 'P',
+																 'request': 'R', 'single_occurrence': False}])
+		self.assertEqual((self.rc.cache.hits, self.rc.cache.misses), (2, 1))
+
+	def test_result_cache_timed_rules(self):
+		log = self.log.assign(**{'time:timestamp': pd.date_range('2021-01-01', periods=len(self.log), freq='D')})
+		index = self.rc.build_index(log)
+		self.rc.check_deadline(index, 'R', '3D', label=False)
+		times = index.event_times()
+		self.rc.check_deadline(index, 'R', '3D', label=False)
+		self.assertIs(index.event_times(), times)
+		self.assertEqual((self.rc.cache.hits, self.rc.cache.misses), (1, 1))
+		log['time:timestamp'] = log['time:timestamp'] + pd.Timedelta('1D')
+		self.rc.check_deadline(index, 'R', '3D', label=False)
+		self.assertIsNot(index.event_times(), times)
+		self.assertEqual(self.rc.cache.misses, 2)
+
+	def test_result_cache_spill(self):
+		with tempfile.TemporaryDirectory() as spill_dir:
+			rc = RuleChecker(cache=ResultCache(max_bytes=1, spill_dir=spill_dir))
+			rc.check_precedence(self.log, 'P', 'R', label=False)
+			rc.check_response(self.log, 'P', 'R', label=False)
+			self.assertEqual(len(rc.cache), 1)
+			rc.check_precedence(self.log, 'P', 'R', label=False)
+			self.assertEqual(rc.case_id_dict, {'2': 2, '4': 1, '6': 4, '9': 1})
+			self.assertEqual(rc.cache.hits, 1)
+
+	def test_check_many_unknown_rule(self):
+		with self.assertRaises(ValueError):
+			self.rc.check_many(self.log, [('succession', 'P', 'R')])
+
+	def test_trace_index(self):
+		index = self.rc.build_index(self.log)
+		self.assertEqual(index.contains('R').tolist(), [False] + [True] * 6 + [False, True])
+		self.rc.check_precedence(index, 'P', 'R')
+		self.assertEqual(self.rc.case_id_dict, {'2': 2, '4': 1, '6': 4, '9': 1})
+
+	def test_trace_index_refresh(self):
+		index = self.rc.build_index(self.log)
+		self.log.loc[self.log['case:concept:name'] == '6', 'concept:name'] = 'P'
+		self.rc.check_precedence(index.refresh(), 'P', 'R')
+		self.assertEqual(self.rc.case_id_dict, {'2': 2, '4': 1, '9': 1})
+		self.log['concept:name'] = self.log['concept:name'].replace('P', 'R')
+		self.assertFalse(index.is_current())
+		self.rc.check_precedence(index, 'P', 'R')
+		self.assertEqual((self.rc.violations, self.rc.cases), (8, 8))
+		self.assertTrue(index.is_current())
+
+	def test_prefix_reduction(self):
+		log = self.rc.check_many(self.log, [('precedence', 'P', 'R'), ('cardinality', 'P', 1, 0)])
+		reduced = self.rc.prefix_reduction(log, hierarchical=True, drop_help_cols=False)
+		cases = reduced.groupby('case:concept:name')[['y', 'y_pos']].first()
+		self.assertEqual(cases.loc['6'].tolist(), [1, 3])
+		self.assertEqual(cases.loc['7'].tolist(), [2, 2])
+		self.assertEqual(reduced.groupby('case:concept:name').size().loc['6'], 3)
+		self.assertNotIn('1', cases.index)
+
+	def test_check_many_parallel(self):
+		rules = [('precedence', 'P', 'R'), ('response', 'P', 'R'), ('exclusive', 'B', 'R')]
+		serial = self.rc.check_many(self.log.copy(), rules)
+		rc = RuleChecker(n_jobs=2)
+		parallel = rc.check_many(self.log.copy(), rules)
+		pd.testing.assert_frame_equal(serial, parallel)
+		self.assertEqual((rc.violations, rc.cases), (self.rc.violations, self.rc.cases))
+
+	@skipUnless(importlib.util.find_spec('pyarrow'), 'requires pyarrow')
+	def test_check_partitioned(self):
+		rules = [('precedence', 'P', 'R'), ('cardinality', 'P', 1, 0)]
+		log = self.log.assign(row=range(len(self.log)))
+		in_memory = self.rc.prefix_reduction(self.rc.check_many(log.copy(), rules), prefix_reduction=2)
+		with tempfile.TemporaryDirectory() as path:
+			chunks = [log.iloc[:15], log.iloc[15:]]
+			partition.write_partitions(chunks, path + '/log', n_partitions=3)
+			rc = RuleChecker()
+			summary = rc.check_partitioned(path + '/log', path + '/labeled', rules, prefix_reduction=True,
+										   prefix_reduction_size=2)
+			labeled = pd.concat(df for _, df in partition.iter_partitions(path + '/labeled'))
+		labeled = labeled.sort_values('row').reset_index(drop=True)
+		pd.testing.assert_frame_equal(labeled, in_memory.sort_values('row').reset_index(drop=True),
+									  check_dtype=False)
+		self.assertEqual(summary[['violations', 'cases']].values.tolist(), [[4, 7], [3, 9]])
+		self.assertEqual((rc.violations, rc.cases), (self.rc.violations, self.rc.cases))
+
+	def test_prefix_view(self):
+		log = self.rc.check_many(self.log.assign(num=range(len(self.log))), [('precedence', 'P', 'R')])
+		view = self.rc.prefix_view(log, num_cols=['num'], prefix_reduction=0, min_trace_length=1)
+		reduced = self.rc.prefix_reduction(log, prefix_reduction=0, min_trace_length=1)
+		expected = [(events[:length].tolist(), case['y'].iloc[0])
+					for _, case in reduced.groupby('case:concept:name', sort=True)
+					for events in [case['num'].to_numpy(dtype=float)] for length in range(1, len(events) + 1)]
+		prefixes = [(view[i]['x_num'][:, 0].tolist(), view[i]['y']) for i in range(len(view))]
+		self.assertEqual(prefixes, expected)
+
+	def test_profile(self):
+		records = list()
+		rc = RuleChecker(variants=False, callbacks=[records.append])
+		with self.assertLogs('conformancelabeler.conformance_checking.rule_check', 'INFO') as logs:
+			with rc.profile(memory=True) as profile:
+				log = rc.check_many(self.log, [('precedence', 'P', 'R'), ('response', 'P', 'R')])
+				rc.prefix_reduction(log)
+		self.assertEqual(len(logs.records), 2)
+		self.assertEqual(records, profile.records)
+		self.assertEqual([(r['stage'], r.get('rule')) for r in profile.records],
+						 [('grouping', None), ('evaluation', 'precedence(P, R)'), ('evaluation', 'response(P, R)'),
+						  ('check', 'precedence(P, R)'), ('labeling', 'precedence(P, R)'),
+						  ('check', 'response(P, R)'), ('labeling', 'response(P, R)'), ('prefix_reduction', None)])
+		self.assertEqual(profile.records[0]['cases'], 9)
+		self.assertEqual(profile.records[3]['violations'], 4)
+		self.assertIn('memory_delta', profile.records[0])
+		summary = profile.summary()
+		self.assertEqual(summary.set_index(['stage', 'rule']).loc[('check', 'precedence(P, R)'), 'violations'], 4)
+		self.assertEqual(json.loads(profile.to_json())['records'][0]['stage'], 'grouping')
+		rc.check_order(self.log, 'A', 'B')
+		self.assertEqual(len(profile.records), 8)
+		self.assertEqual(len(records), 11)
+
+	def test_rule_results(self):
+		rules = [('precedence', 'P', 'R'), ('cardinality', 'P', 1, 0)]
+		precedence, cardinality = self.rc.evaluate(self.log, rules)
+		self.assertEqual((self.rc.violations, self.rc.cases, self.rc.label_list), (0, 0, []))
+		self.assertEqual(precedence.name, 'precedence_P_R')
+		self.assertEqual((precedence.violations, precedence.cases), (4, 7))
+		self.assertEqual(precedence.case_id_dict, {'2': 2, '4': 1, '6': 4, '9': 1})
+		with self.assertRaises(ValueError):
+			precedence.position[0] = 1
+
+		labeled = self.rc.label(self.log, [precedence, cardinality])
+		self.assertNotIn('precedence_P_R', self.log.columns)
+		rc = RuleChecker()
+		expected = rc.check_many(self.log.copy(), rules)
+		pd.testing.assert_frame_equal(labeled, expected)
+		for hierarchical in (False, True):
+			pd.testing.assert_frame_equal(
+				self.rc.reduce(self.log, [precedence, cardinality], hierarchical=hierarchical),
+				rc.prefix_reduction(expected, hierarchical=hierarchical, drop_help_cols=True))
+
+		combined = RuleResult.combine([precedence, cardinality])
+		self.assertEqual(combined.case_id_dict, {'2': 2, '4': 1, '5': 3, '6': 4, '7': 3, '9': 1})
+		subset = self.log[self.log['case:concept:name'].isin(['5', '6'])]
+		self.assertEqual(self.rc.label(subset, [precedence]).groupby('case:concept:name')['Pos_precedence_P_R']
+						 .first().tolist(), [5, 4])
+
+	def test_rule_results_unlabeled_violations(self):
+		log = to_log({'1': ['P', 'A'], '2': ['P', 'R']})
+		msg = self.rc.check_response(log, 'P', 'R', single_occurrence=True, label=False)
+		result, = self.rc.evaluate(log, [('response', 'P', 'R', True)])
+		self.assertEqual(result.message, msg)
+		self.assertEqual((result.violations, result.cases, result.get_percentage()), (1, 2, 50.0))
+		self.assertEqual(result.violated.tolist(), [True, False])
+		self.assertEqual(result.case_id_dict, {})
+		with self.assertRaises(ValueError):
+			result.violated[0] = False
+		self.assertEqual(RuleResult.combine([result]).violations, 1)
+
+	def test_label_list_of_other_logs(self):
+		self.rc.check_precedence(self.log, 'P', 'R', label=True)
+		self.rc.check_precedence(self.log, 'P', 'R', label=True)
+		self.assertEqual(self.rc.label_list, ['precedence_P_R'])
+		log = self.rc.check_response(to_log({'1': ['P', 'A', 'R'], '2': ['P', 'A', 'A']}), 'P', 'R', label=True)
+		self.assertEqual(self.rc.prefix_reduction(log, min_trace_length=1)['y'].tolist(), [0, 0, 1, 1])
+
+	def test_check_many_threads(self):
+		rules = [('precedence', 'P', 'R'), ('response', 'P', 'R'), ('chain_response', 'P', 'B')]
+		serial = self.rc.check_many(self.log.copy(), rules)
+		rc = RuleChecker(n_jobs=3, executor='threads')
+		pd.testing.assert_frame_equal(serial, rc.check_many(self.log.copy(), rules))
+		with self.assertRaises(ValueError):
+			RuleChecker(executor='fibers')
+
+	def test_evaluate_from_threads(self):
+		logs = [self.log, to_log({'1': ['R', 'P'], '2': ['P', 'R', 'B']})]
+		rules = [('precedence', 'P', 'R'), ('exclusive', 'B', 'R')]
+		expected = [[result.case_id_dict for result in RuleChecker().evaluate(log, rules)] for log in logs]
+		rc = RuleChecker(cache=ResultCache(max_bytes=200))
+		with ThreadPoolExecutor(max_workers=4) as pool:
+			results = list(pool.map(lambda i: [result.case_id_dict for result in rc.evaluate(logs[i % 2], rules)],
+									range(40)))
+		self.assertEqual(results, [expected[i % 2] for i in range(40)])
@@ -0,0 +1,51 @@
+from unittest import TestCase
+
+import pandas as pd
+
+from conformancelabeler.conformance_checking.stream import StreamingChecker, Violation
+
+
+class TestStreamingChecker(TestCase):
+
+	def setUp(self):
+		self.sc = StreamingChecker([('precedence', 'P', 'R'), ('response', 'P', 'R'), ('cardinality', 'R', 1, 0)])
+
+	def feed(self, case_id, events, start=pd.Timestamp('2019-01-01')):
+		found = list()
+		for i, event in enumerate(events):
+			found += self.sc.feed(case_id, event, start + pd.Timedelta(hours=i))
+		return found
+
+	def test_feed(self):
+		found = self.feed('6', ['A', 'P', 'B', 'R', 'R'])
+		self.assertEqual([(v.rule, v.position) for v in found], [('precedence_P_R', 4), ('cardinality_R_1_0', 4)])
+		self.assertEqual(self.feed('3', ['A', 'P', 'B', 'R']), [])
+
+	def test_close(self):
+		self.assertEqual(self.feed('8', ['A', 'P']), [])
+		found = self.sc.close('8')
+		self.assertEqual(found, [Violation('8', 'response_P_R', 2, pd.Timestamp('2019-01-01 01:00'))])
+		self.assertEqual(self.sc.violations['response_P_R'], 1)
+		self.assertEqual(self.sc.cases, {'precedence_P_R': 0, 'response_P_R': 1, 'cardinality_R_1_0': 1})
+		self.assertEqual(len(self.sc.open_cases), 0)
+
+	def test_evict_idle(self):
+		self.sc.idle_timeout = pd.Timedelta(days=1)
+		self.feed('8', ['A', 'P'])
+		found = self.feed('3', ['A'], start=pd.Timestamp('2019-01-03'))
+		self.assertEqual([(v.case_id, v.rule) for v in found], [('8', 'response_P_R')])
+		self.assertEqual(list(self.sc.open_cases), ['3'])
+
+	def test_evict_max_cases(self):
+		self.sc.max_cases = 1
+		self.feed('8', ['A', 'P'])
+		self.feed('3', ['A'])
+		self.assertEqual(list(self.sc.open_cases), ['3'])
+		self.assertEqual(self.sc.violations['response_P_R'], 1)
+
+	def test_time_elapse_without_timestamp(self):
+		self.assertEqual(self.sc.feed('1', 'P'), [])
+		sc = StreamingChecker([('precedence', 'P', 'R'), ('time_elapse', 'E')])
+		with self.assertRaises(ValueError):
+			sc.feed('1', 'A')
+		self.assertEqual(len(sc.open_cases), 0)
@@ -1,6 +1,7 @@
+import numpy as np
 import pandas as pd
 from pm4py.algo.filtering.pandas.timestamp import timestamp_filter
-from .metrics import get_activity_count
+from .trace_index import TraceIndex
 
 
 def timefilter(df: pd.DataFrame, start, end, timestamp_col='time:timestamp') -> pd.DataFrame:
@@ -10,8 +11,75 @@ def timefilter(df: pd.DataFrame, start, end, timestamp_col='time:timestamp') ->
     return df
 
 
-def filter_by_min_activity(log: pd.DataFrame, activity: str, min: int) -> pd.DataFrame:
-    log = get_activity_count(log, activity)
-    log = log[log["Count " + activity] >= min]
-    log = log.drop(columns=["Count " + activity])
-    return log
\ No newline at end of file
+def _index(log, case_id_col: str, activity_col: str) -> TraceIndex:
+    """
+    Index of a log or TraceIndex, holding the sparse activity counts per case.
+
+    Pass a TraceIndex to reuse its counts across several filters of the same log.
+    """
+    if isinstance(log, TraceIndex):
+        return log.validate()
+    return TraceIndex(log, case_id_col, activity_col)
+
+
+def _keep(index: TraceIndex, cases: np.ndarray) -> pd.DataFrame:
+    """Rows of the cases for which ``cases`` holds, selected by a boolean mask."""
+    return index.log[index.broadcast(cases, fill=False)]
+
+
+def filter_by_activity_count(log: pd.DataFrame, activity: str, min=None, max=None,
+                             case_id_col='case:concept:name', activity_col='concept:name') -> pd.DataFrame:
+    """Keep cases with at least ``min`` and at most ``max`` occurrences of an activity."""
+    index = _index(log, case_id_col, activity_col)
+    counts = index.activity_counts(activity)
+    keep = np.ones(index.n_cases, dtype=bool)
+    if min is not None:
+        keep &= counts >= min
+    if max is not None:
+        keep &= counts <= max
+    return _keep(index, keep)
+
+
+def filter_by_min_activity(log: pd.DataFrame, activity: str, min: int,
+                           case_id_col='case:concept:name', activity_col='concept:name') -> pd.DataFrame:
+    return filter_by_activity_count(log, activity, min=min, case_id_col=case_id_col,
+                                    activity_col=activity_col)
+
+
+def filter_by_max_activity(log: pd.DataFrame, activity: str, max: int,
+                           case_id_col='case:concept:name', activity_col='concept:name') -> pd.DataFrame:
+    return filter_by_activity_count(log, activity, max=max, case_id_col=case_id_col,
+                                    activity_col=activity_col)
+
+
+def filter_contains(log: pd.DataFrame, activities, how='all',
+                    case_id_col='case:concept:name', activity_col='concept:name') -> pd.DataFrame:
+    """
+    Keep cases containing activities.
+
+    :param activities: activity or iterable of activities
+    :param how: 'all' keeps cases containing all activities, 'any' cases containing at least one
+    """
+    if how not in ('all', 'any'):
+        raise ValueError("how must be 'all' or 'any', got '" + str(how) + "'")
+    index = _index(log, case_id_col, activity_col)
+    if isinstance(activities, str):
+        activities = [activities]
+    contains = [index.contains(activity) for activity in activities]
+    if how == 'all':
+        keep = np.logical_and.reduce(contains) if contains else np.ones(index.n_cases, dtype=bool)
+    else:
+        keep = np.logical_or.reduce(contains) if contains else np.zeros(index.n_cases, dtype=bool)
+    return _keep(index, keep)
+
+
+def filter_not_contains(log: pd.DataFrame, activities,
+                        case_id_col='case:concept:name', activity_col='concept:name') -> pd.DataFrame:
+    """Keep cases containing none of the activities."""
+    index = _index(log, case_id_col, activity_col)
+    if isinstance(activities, str):
+        activities = [activities]
+    keep = np.ones(index.n_cases, dtype=bool)
+    for activity in activities:
+        keep &= ~index.contains(activity)
+    return _keep(index, keep)
@@ -2,19 +2,199 @@ import pandas as pd
 import numpy as np
 from pm4py.objects.log.importer.xes import importer as xes_importer
 from pm4py.objects.conversion.log import converter as log_converter
+import gzip
+import hashlib
+import json
 import os
 import pickle
+import warnings
+import xml.etree.ElementTree as ET
 
+from .trace_index import fingerprint
 
-def read_xes(file: str):
+
+def read_xes(file: str, chunksize=None, cache_dir=None,
+			 dictionary_cols=('case:concept:name', 'concept:name', 'org:resource')):
+	"""
+	Import an XES event log as a DataFrame.
+
+	:param chunksize: if given, return an iterator over DataFrames of chunksize
+	complete cases each instead of importing the whole log, see iter_xes
+	:param cache_dir: if given, the imported log is kept in an Arrow IPC file in
+	this directory, keyed on the path, size and modification time of the XES file,
+	and later calls read it from there instead of parsing the XES file (requires
+	pyarrow)
+	:param dictionary_cols: columns stored dictionary-encoded in the cache and
+	loaded as categoricals
+	"""
+	if chunksize is not None:
+		return iter_xes(file, chunksize=chunksize)
+	if cache_dir is not None:
+		path = cache_path(file, cache_dir)
+		if not os.path.exists(path):
+			df = read_xes(file)
+			write_cache(df, path, [col for col in dictionary_cols if col in df.columns])
+		return read_cache(path)
 	df = xes_importer.apply(file)
 	df = log_converter.apply(df, variant=log_converter.Variants.TO_DATA_FRAME)
 	return df
 
+
+def cache_path(file: str, cache_dir: str) -> str:
+	"""Cache file of an XES file, changes with its path, size and modification time."""
+	stat = os.stat(file)
+	key = '|'.join([os.path.abspath(file), str(stat.st_size), str(stat.st_mtime_ns)])
+	name = os.path.basename(str(file)).split('.')[0]
+	return os.path.join(cache_dir, name + '-' + hashlib.sha1(key.encode()).hexdigest()[:16] + '.arrow')
+
+
+def write_cache(df: pd.DataFrame, path: str, dictionary_cols=()):
+	"""Write a log to an uncompressed Arrow IPC file with dictionary-encoded columns."""
+	import pyarrow as pa
+
+	df = df.astype(dict((col, 'category') for col in dictionary_cols))
+	table = pa.Table.from_pandas(df, preserve_index=False)
+	os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+	tmp = path + '.' + str(os.getpid()) + '.tmp'
+	with pa.OSFile(tmp, 'wb') as sink:
+		with pa.ipc.new_file(sink, table.schema) as writer:
+			writer.write_table(table)
+	os.replace(tmp, path)
+
+
+def read_cache(path: str) -> pd.DataFrame:
+	"""
+	Load a log written by write_cache.
+
+	The file is memory-mapped while reading, the columns are copied into a new
+	DataFrame, so the result does not depend on the file.
+	"""
+	import pyarrow as pa
+
+	with pa.memory_map(path, 'r') as source:
+		return pa.ipc.open_file(source).read_all().to_pandas()
+
+
+_XES_TYPES = {
+	'string': str,
+	'id': str,
+	'int': int,
+	'float': float,
+	'boolean': lambda value: value.lower() == 'true',
+	'date': str,
+}
+
+
+def _local_name(tag: str) -> str:
+	return tag.rsplit('}', 1)[-1]
+
+
+def _attributes(elem) -> tuple:
+	values = dict()
+	dates = list()
+	for child in elem:
+		kind = _local_name(child.tag)
+		if kind in _XES_TYPES and 'key' in child.attrib:
+			values[child.attrib['key']] = _XES_TYPES[kind](child.attrib.get('value'))
+			if kind == 'date':
+				dates.append(child.attrib['key'])
+	return values, dates
+
+
+def iter_xes(file: str, chunksize=10000,
+			 case_id_col='case:concept:name',
+			 activity_col='concept:name'):
+	"""
+	Stream an XES event log as DataFrames of complete cases.
+
+	The file is parsed incrementally, every trace is released once it has been
+	converted, so memory is bounded by the size of a chunk. Columns are named like
+	the pm4py conversion (trace attributes prefixed with 'case:'), dates are parsed
+	to UTC timestamps and the case and activity columns are categorical. Nested list
+	and container attributes are skipped.
+
+	:param file: path to a .xes or .xes.gz file
+	:param chunksize: number of cases per DataFrame
+	"""
+	opener = gzip.open if str(file).endswith('.gz') else open
+	with opener(file, 'rb') as f:
+		rows = list()
+		dates = set()
+		cases = 0
+		root = None
+		for event, elem in ET.iterparse(f, events=('start', 'end')):
+			if root is None:
+				root = elem
+			if event != 'end' or _local_name(elem.tag) != 'trace':
+				continue
+			trace, trace_dates = _attributes(elem)
+			trace = dict(('case:' + key, value) for key, value in trace.items())
+			dates.update('case:' + key for key in trace_dates)
+			for child in elem:
+				if _local_name(child.tag) == 'event':
+					values, event_dates = _attributes(child)
+					values.update(trace)
+					rows.append(values)
+					dates.update(event_dates)
+			cases += 1
+			root.clear()
+			if cases == chunksize:
+				yield _to_frame(rows, dates, case_id_col, activity_col)
+				rows, dates, cases = list(), set(), 0
+		if cases:
+			yield _to_frame(rows, dates, case_id_col, activity_col)
+
+
+def _to_frame(rows: list, dates: set, case_id_col: str, activity_col: str) -> pd.DataFrame:
+	df = pd.DataFrame(rows)
+	for col in dates:
+		df[col] = pd.to_datetime(df[col], utc=True, format='ISO8601')
+	for col in [case_id_col, activity_col]:
+		if col in df.columns:
+			df[col] = df[col].astype('category')
+	return df
+
 def count_traces(df: pd.DataFrame, case_id_col='case:concept:name') -> int:
 	return len(df[case_id_col].unique())
 
 
+def compact(log: pd.DataFrame, categorical_cols=('case:concept:name', 'concept:name', 'org:resource'),
+			timestamp_col='time:timestamp', max_category_ratio=0.5) -> pd.DataFrame:
+	"""
+	Convert a log into a low-memory representation without losing information.
+
+	Case, activity and resource columns become categoricals, i.e. integer codes into
+	a vocabulary of their values, so activity names keep working as arguments of the
+	RuleChecker and the metrics. Other string columns become categoricals if they have
+	at most max_category_ratio distinct values per row. Timestamps are stored as
+	datetime64 backed by int64, integers are downcast to the smallest type and
+	floats to float32 where this keeps all values.
+
+	:return: compacted copy of the log
+	"""
+	columns = dict()
+	for col in log.columns:
+		values = log[col]
+		if col == timestamp_col or pd.api.types.is_datetime64_any_dtype(values):
+			if not pd.api.types.is_datetime64_any_dtype(values):
+				values = pd.to_datetime(values, utc=True, format='ISO8601')
+		elif isinstance(values.dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(values):
+			pass
+		elif col in categorical_cols:
+			values = values.astype('category')
+		elif pd.api.types.is_integer_dtype(values):
+			values = pd.to_numeric(values, downcast='integer')
+		elif pd.api.types.is_float_dtype(values):
+			downcast = values.astype(np.float32)
+			if ((downcast.astype(values.dtype) == values) | values.isna()).all():
+				values = downcast
+		elif ((values.dtype == object or pd.api.types.is_string_dtype(values))
+			  and values.nunique() <= max_category_ratio * len(values)):
+			values = values.astype('category')
+		columns[col] = values
+	return pd.DataFrame(columns, index=log.index)
+
+
 def to_categorical(log: pd.DataFrame,
 				   			cat_cols,
 							  case_id_col='case:concept:name',
@@ -46,6 +226,7 @@ def num_embeddings(log, cat_cols: list)->list:
 
 def to_pickle(log, processed_path, num_cols, cat_cols,
 		   case_id_col='case:concept:name', target_col='y'):
+	warnings.warn('to_pickle is deprecated, use to_npy', DeprecationWarning, stacklevel=2)
 
 	case_list = log[case_id_col].unique().tolist()
 
@@ -70,3 +251,90 @@ def to_pickle(log, processed_path, num_cols, cat_cols,
 				pickle.dump(x_num, f)
 			with open(os.path.join(processed_path, 'x_cat.pkl'), 'wb') as f:
 				pickle.dump(x_cat, f)
+
+	np.save(file=os.path.join(processed_path, 'targets.npy'), arr=targets)
+	with open(os.path.join(processed_path, 'x_num.pkl'), 'wb') as f:
+		pickle.dump(x_num, f)
+	with open(os.path.join(processed_path, 'x_cat.pkl'), 'wb') as f:
+		pickle.dump(x_cat, f)
+
+
+def to_npy(log, processed_path, num_cols, cat_cols,
+		   case_id_col='case:concept:name', target_col='y'):
+	"""
+	Export the events of a log as flat arrays of all cases.
+
+	The log is sorted once by case, cases keep the order of their first event and
+	events their order within the case. Every array is written in a single pass
+	into a memory-mapped .npy file:
+
+	- x_num.npy: float numerical features of all events
+	- x_cat.npy: integer categorical features of all events
+	- offsets.npy: start of every case in the events, followed by the number of events
+	- targets.npy: target of the first event of every case
+	- case_ids.npy: id of every case
+
+	The events of case i are x_num[offsets[i]:offsets[i + 1]]. Finished arrays are
+	recorded in manifest.json together with a fingerprint of the case id, feature
+	and target columns. An interrupted export of the same log resumes with the
+	remaining arrays, the export of another log starts over.
+	"""
+	case_codes, case_ids = pd.factorize(log[case_id_col])
+	order = np.argsort(case_codes, kind='stable')
+	order = order[case_codes[order] >= 0]
+	offsets = np.zeros(len(case_ids) + 1, dtype=np.int64)
+	np.cumsum(np.bincount(case_codes[order], minlength=len(case_ids)), out=offsets[1:])
+
+	manifest_path = os.path.join(processed_path, 'manifest.json')
+	manifest = {'n_cases': len(case_ids), 'n_events': len(order),
+				'num_cols': list(num_cols), 'cat_cols': list(cat_cols),
+				'fingerprint': fingerprint(log, [case_id_col] + list(num_cols) + list(cat_cols) + [target_col]),
+				'done': []}
+	if os.path.exists(manifest_path):
+		with open(manifest_path) as f:
+			previous = json.load(f)
+		if dict(previous, done=[]) == manifest:
+			manifest = previous
+
+	def write(name, shape, dtype, fill):
+		if name in manifest['done']:
+			return
+		arr = np.lib.format.open_memmap(os.path.join(processed_path, name + '.npy'),
+										mode='w+', dtype=dtype, shape=shape)
+		fill(arr)
+		arr.flush()
+		del arr
+		manifest['done'].append(name)
+		with open(manifest_path, 'w') as f:
+			json.dump(manifest, f)
+
+	def columns(cols, dtype):
+		def fill(arr):
+			for j, col in enumerate(cols):
+				arr[:, j] = log[col].to_numpy(dtype=dtype)[order]
+		return fill
+
+	def values(arr):
+		def fill(out):
+			out[:] = arr
+		return fill
+
+	targets = log[target_col].to_numpy()[order][offsets[:-1]]
+	if targets.dtype.kind not in 'biuf':
+		targets = targets.astype(float)
+	case_ids = np.array(case_ids, dtype=str)
+
+	os.makedirs(processed_path, exist_ok=True)
+	write('offsets', offsets.shape, offsets.dtype, values(offsets))
+	write('x_num', (len(order), len(num_cols)), np.float64, columns(num_cols, float))
+	write('x_cat', (len(order), len(cat_cols)), np.int64, columns(cat_cols, np.int64))
+	write('targets', targets.shape, targets.dtype, values(targets))
+	write('case_ids', case_ids.shape, case_ids.dtype, values(case_ids))
+
+
+def read_npy(processed_path, mmap_mode='r') -> dict:
+	"""Load the arrays written by to_npy, memory-mapped by default."""
+	with open(os.path.join(processed_path, 'manifest.json')) as f:
+		manifest = json.load(f)
+	return dict((name, np.load(os.path.join(processed_path, name + '.npy'), mmap_mode=mmap_mode))
+				for name in manifest['done'])
@@ -1,16 +1,40 @@
+"""
+Features of the events of a log.
+
+Every function accepts a log or a TraceIndex over it and returns a new DataFrame
+with the feature columns. Neither the log passed in nor the log of the index is
+changed.
+"""
 import pandas as pd
+from .pipeline import FeaturePipeline, TIME_FEATURES
+from .trace_index import TraceIndex
+
+
+def _unwrap(log, **columns):
+    """
+    Resolve a TraceIndex passed in place of a log into the log and the index columns.
+
+    The log is returned as a shallow copy, so assigning columns leaves the caller's log unchanged.
+    """
+    if not isinstance(log, TraceIndex):
+        return (log.copy(deep=False),) + tuple(columns.values())
+    index = log.validate()
+    names = {"case_id_col": index.id, "activity_col": index.trace, "timestamp_col": index.timecol}
+    return (index.log.copy(deep=False),) + tuple(names[col] for col in columns)
+
 
 def get_activity_count(df: pd.DataFrame, event_name: str, case_id_col='case:concept:name',
                        activity_col="concept:name") -> pd.DataFrame:
-    df = df.merge(df.groupby([case_id_col])[activity_col]
-                  .value_counts().unstack(fill_value=0
-                                          ).loc[:, event_name].reset_index()
-                  .rename(columns={event_name: "Count " + event_name}),
-                  on=[case_id_col], how="left")
-    return df
+    if isinstance(df, TraceIndex):
+        index = df.validate()
+        return index.log.assign(**{"Count " + event_name:
+                                   index.broadcast(index.activity_counts(event_name))})
+    index = TraceIndex(df, case_id_col, activity_col)
+    return df.assign(**{"Count " + event_name: index.broadcast(index.activity_counts(event_name))})
 
 def get_event_duration(log: pd.DataFrame, case_id_col='case:concept:name',
                        timestamp_col='time:timestamp'):
+    log, case_id_col, timestamp_col = _unwrap(log, case_id_col=case_id_col, timestamp_col=timestamp_col)
     log[timestamp_col] = log[timestamp_col].dt.tz_localize(None)
     log["duration"] = log.groupby(case_id_col)[timestamp_col].diff().dt.total_seconds().shift(-1)
     log["duration"] = (log.duration).astype(float) / 3600
@@ -18,6 +42,7 @@ def get_event_duration(log: pd.DataFrame, case_id_col='case:concept:name',
 
 def get_time_since_last_event(log: pd.DataFrame, case_id_col='case:concept:name',
                               timestamp_col='time:timestamp'):
+    log, case_id_col, timestamp_col = _unwrap(log, case_id_col=case_id_col, timestamp_col=timestamp_col)
     log[timestamp_col] = log[timestamp_col].dt.tz_localize(None)
     log["time_since_last_event"] = (log.groupby(case_id_col)[timestamp_col].diff()).dt.total_seconds().fillna(0)
     return log
@@ -25,19 +50,21 @@ def get_time_since_last_event(log: pd.DataFrame, case_id_col='case:concept:name'
 
 def get_time_since_first_event(log: pd.DataFrame, case_id_col='case:concept:name',
                                timestamp_col='time:timestamp'):
+    log, case_id_col, timestamp_col = _unwrap(log, case_id_col=case_id_col, timestamp_col=timestamp_col)
     log[timestamp_col] = log[timestamp_col].dt.tz_localize(None)
     if not 'time_since_last_event' in log.columns.tolist():
         log = get_time_since_last_event(log)
-    log["time_since_first_event"] =log.groupby(case_id_col)["time_since_last_event"].apply(lambda x: x.cumsum())
+    log["time_since_first_event"] = log.groupby(case_id_col)["time_since_last_event"].cumsum()
     return log
 
 
 def get_cumulative_duration(log: pd.DataFrame, case_id_col='case:concept:name',
                             timestamp_col='time:timestamp'):
+    log, case_id_col, timestamp_col = _unwrap(log, case_id_col=case_id_col, timestamp_col=timestamp_col)
     dur = False
     if not "duration" in log.columns.tolist():
         log = get_event_duration(log, case_id_col=case_id_col, timestamp_col=timestamp_col)
-    log["cumulative_duration"] = log.groupby(case_id_col)["duration"].apply(lambda x: x.cumsum())
+    log["cumulative_duration"] = log.groupby(case_id_col)["duration"].cumsum()
     if dur:
         log = log.drop(columns=["duration"])
     return log
@@ -45,6 +72,7 @@ def get_cumulative_duration(log: pd.DataFrame, case_id_col='case:concept:name',
 
 def get_total_duration(log: pd.DataFrame, case_id_col='case:concept:name',
                        timestamp_col='time:timestamp'):
+    log, case_id_col, timestamp_col = _unwrap(log, case_id_col=case_id_col, timestamp_col=timestamp_col)
     dur = False
     if not "duration" in log.columns.tolist():
         log = get_event_duration(log, case_id_col=case_id_col, timestamp_col=timestamp_col)
@@ -56,6 +84,7 @@ def get_total_duration(log: pd.DataFrame, case_id_col='case:concept:name',
 
 
 def get_time_attributes(log: pd.DataFrame,  timestamp_col='time:timestamp'):
+    log, timestamp_col = _unwrap(log, timestamp_col=timestamp_col)
     log[timestamp_col] = log[timestamp_col].dt.tz_localize(None)
     log["year"] = log[timestamp_col].dt.year
     log["month"] = log[timestamp_col].dt.month
@@ -65,21 +94,45 @@ def get_time_attributes(log: pd.DataFrame,  timestamp_col='time:timestamp'):
 
 
 def get_seq_length(log: pd.DataFrame, case_id_col='case:concept:name'):
+    if isinstance(log, TraceIndex):
+        index = log.validate()
+        return index.log.assign(trace_length=index.broadcast(index.lengths))
     log = log.merge(log.groupby(case_id_col).size().reset_index().rename(columns={0: "trace_length"}),
                     on=[case_id_col], how="left")
     return log
 
 def get_event_nr(log:pd.DataFrame, case_id_col='case:concept:name'):
+    if isinstance(log, TraceIndex):
+        index = log.validate()
+        return index.log.assign(event_nr=index.event_positions() + 1)
+    log = log.copy(deep=False)
     log["event_nr"] = 1
     log["event_nr"] = log.groupby([case_id_col])["event_nr"].cumsum()
     return log
 
 def get_remaining_time(log: pd.DataFrame, case_id_col='case:concept:name',
                        timestamp_col='time:timestamp'):
+    log, case_id_col, timestamp_col = _unwrap(log, case_id_col=case_id_col, timestamp_col=timestamp_col)
     if not "duration" in log.columns.tolist():
         log = get_event_duration(log, case_id_col=case_id_col, timestamp_col=timestamp_col)
     log["remaining_time"] = (log[::-1].groupby(case_id_col)["duration"].cumsum().fillna(0)).astype(float)
     return log
 
 
+def compute_time_features(log: pd.DataFrame, features=TIME_FEATURES, case_id_col='case:concept:name',
+                          timestamp_col='time:timestamp'):
+    """
+    Add time features of the events in a single pass over the log sorted by case.
+
+    Features are computed like the ``get_`` functions of this module: duration,
+    cumulative, total and remaining time in hours, time since the last and the first
+    event in seconds, calendar attributes, event number and trace length. Rows are
+    sorted by case once, keeping their order within a case, and all features are
+    computed with grouped operations on int64 nanosecond timestamps by a
+    FeaturePipeline. The timestamp column is not modified.
 
+    :param log: event log or TraceIndex
+    :param features: features of TIME_FEATURES to add
+    :return: log with one column per feature
+    """
+    return FeaturePipeline(case_id_col=case_id_col, timestamp_col=timestamp_col).add(*features).run(log)
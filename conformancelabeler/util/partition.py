@@ -0,0 +1,71 @@
+"""
+Event logs stored as Parquet files partitioned by case.
+
+Every case is assigned to a partition by a hash of its id, so all events of a case
+end up in the same partition no matter in which chunk of the log they are
+written. A partition is a directory of Parquet files holding the rows of the
+partition in the order they were written. Writing and reading Parquet requires
+pyarrow.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+
+def partition_of(case_ids, n_partitions: int) -> np.ndarray:
+    """Partition of every case id, stable across chunks and processes."""
+    hashes = pd.util.hash_pandas_object(pd.Series(case_ids).astype(str), index=False)
+    return (hashes.to_numpy() % np.uint64(n_partitions)).astype(np.int64)
+
+
+def write_partitions(log, path: str, n_partitions=64, case_id_col='case:concept:name') -> list:
+    """
+    Write a log partitioned by case into a directory.
+
+    :param log: DataFrame or iterable of DataFrames, e.g. the chunks of read_xes,
+    the rows of a case may be spread over several chunks
+    :return: names of the written partitions
+    """
+    if isinstance(log, pd.DataFrame):
+        log = [log]
+    written = set()
+    for chunk in log:
+        partitions = partition_of(chunk[case_id_col], n_partitions)
+        order = np.argsort(partitions, kind='stable')
+        bounds = np.flatnonzero(np.diff(partitions[order], prepend=-1, append=-1) != 0)
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            name = 'part-%05d' % partitions[order[start]]
+            write_partition(chunk.iloc[order[start:stop]], path, name)
+            written.add(name)
+    return sorted(written)
+
+
+def write_partition(log: pd.DataFrame, path: str, name: str):
+    """Append the rows of a partition as a new file of the partition."""
+    directory = os.path.join(path, name)
+    os.makedirs(directory, exist_ok=True)
+    file = os.path.join(directory, 'chunk-%06d.parquet' % len(_files(directory)))
+    tmp = file + '.' + str(os.getpid()) + '.tmp'
+    log.to_parquet(tmp, index=False)
+    os.replace(tmp, file)
+
+
+def read_partition(path: str, name: str) -> pd.DataFrame:
+    directory = os.path.join(path, name)
+    return pd.concat([pd.read_parquet(file) for file in _files(directory)], ignore_index=True)
+
+
+def partitions(path: str) -> list:
+    return sorted(name for name in os.listdir(path) if os.path.isdir(os.path.join(path, name)))
+
+
+def iter_partitions(path: str):
+    """Name and rows of every partition, one partition in memory at a time."""
+    for name in partitions(path):
+        yield name, read_partition(path, name)
+
+
+def _files(directory: str) -> list:
+    return [os.path.join(directory, file) for file in sorted(os.listdir(directory))
+            if file.endswith('.parquet')]
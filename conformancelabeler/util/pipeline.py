@@ -0,0 +1,315 @@
+"""
+Lazy pipeline of event log features and case filters.
+
+Features and filters are declared first and computed by ``run``. Every feature
+and filter depends on intermediate stages, e.g. the rows sorted by case, the
+case boundaries or the timestamps as int64 nanoseconds, which form a dependency
+graph. ``run`` computes every stage needed exactly once, in dependency order,
+records the time spent per stage and adds only the declared feature columns.
+"""
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from .trace_index import TraceIndex
+
+TIME_FEATURES = ("duration", "time_since_last_event", "time_since_first_event",
+                 "cumulative_duration", "total_duration", "remaining_time",
+                 "year", "month", "weekday", "hour", "event_nr", "trace_length")
+
+_CALENDAR = ("year", "month", "weekday", "hour")
+
+# stages every stage depends on, parametrized stages are named "stage:parameter"
+_DEPENDENCIES = {
+    "order": (),
+    "groups": ("order",),
+    "times": ("order",),
+    "to_next": ("times", "groups"),
+    "case_start": ("times", "groups"),
+    "case_end": ("times", "groups"),
+    "calendar": ("times",),
+    "activities": ("order",),
+    "count": ("activities", "groups"),
+    "duration": ("to_next",),
+    "time_since_last_event": ("to_next",),
+    "time_since_first_event": ("times", "case_start"),
+    "cumulative_duration": ("times", "to_next", "case_start"),
+    "total_duration": ("case_start", "case_end"),
+    "remaining_time": ("times", "case_end"),
+    "event_nr": ("groups",),
+    "trace_length": ("groups",),
+}
+_DEPENDENCIES.update((feature, ("calendar",)) for feature in _CALENDAR)
+
+# stages every filter depends on
+_FILTER_DEPENDENCIES = {
+    "min_activity": lambda activity, min: ("groups", "count:" + activity),
+    "time_range": lambda start, end: ("case_start", "case_end"),
+    "trace_length": lambda min, max: ("groups",),
+}
+
+
+def _hours(ns):
+    return ns / 1e9 / 3600
+
+
+class FeaturePipeline(object):
+    """
+    Declared features and filters computed together on an event log.
+
+    Features are the TIME_FEATURES, computed like the ``get_`` functions of
+    ``metrics``, and ``"Count <activity>"`` columns. Filters keep complete cases.
+    After ``run``, ``timings`` holds the seconds spent per stage.
+    """
+
+    def __init__(self, case_id_col='case:concept:name', activity_col='concept:name',
+                 timestamp_col='time:timestamp'):
+        self.id = case_id_col
+        self.trace = activity_col
+        self.timecol = timestamp_col
+        self.features = list()
+        self.filters = list()
+        self.timings = OrderedDict()
+
+    def add(self, *features):
+        unknown = [feature for feature in features
+                   if feature not in TIME_FEATURES and not str(feature).startswith("Count ")]
+        if unknown:
+            raise ValueError("Unknown features " + ", ".join(map(str, unknown))
+                             + ", expected any of " + ", ".join(TIME_FEATURES)
+                             + " or 'Count <activity>'")
+        self.features += [feature for feature in features if feature not in self.features]
+        return self
+
+    def count(self, activity: str):
+        """Add the occurrences of an activity in the case as 'Count <activity>'."""
+        return self.add("Count " + activity)
+
+    def filter_min_activity(self, activity: str, min: int):
+        """Keep cases with at least ``min`` occurrences of an activity."""
+        self.filters.append(("min_activity", activity, min))
+        return self
+
+    def filter_time_range(self, start, end):
+        """Keep cases intersecting the time range between ``start`` and ``end``."""
+        self.filters.append(("time_range", start, end))
+        return self
+
+    def filter_trace_length(self, min=None, max=None):
+        """Keep cases with at least ``min`` and at most ``max`` events."""
+        self.filters.append(("trace_length", min, max))
+        return self
+
+    def _stages(self) -> list:
+        """Stage of every feature and filter."""
+        return ([self._feature_stage(feature) for feature in self.features]
+                + ["filter:" + str(i) for i in range(len(self.filters))])
+
+    def _dependencies(self, stage: str) -> tuple:
+        name, _, parameter = stage.partition(":")
+        if name == "filter":
+            kind, *args = self.filters[int(parameter)]
+            return _FILTER_DEPENDENCIES[kind](*args)
+        return _DEPENDENCIES[name]
+
+    @staticmethod
+    def _feature_stage(feature: str) -> str:
+        if feature.startswith("Count "):
+            return "count:" + feature[len("Count "):]
+        return feature
+
+    def plan(self) -> list:
+        """Stages computed by ``run``, each after the stages it depends on."""
+        plan = list()
+
+        def visit(stage):
+            if stage in plan:
+                return
+            for dependency in self._dependencies(stage):
+                visit(dependency)
+            plan.append(stage)
+
+        for stage in self._stages():
+            visit(stage)
+        return plan
+
+    def run(self, log: pd.DataFrame) -> pd.DataFrame:
+        """
+        Compute the declared features and filters.
+
+        :param log: event log or TraceIndex
+        :return: new log with the feature columns, restricted to the kept cases if filters
+        are given, the log passed in is not changed
+        """
+        self.timings = OrderedDict()
+        values = dict()
+        values["columns"] = self.id, self.trace, self.timecol
+        if isinstance(log, TraceIndex):
+            index = log.validate()
+            log = index.log
+            # the columns the index was built from replace the defaults of the pipeline
+            values["columns"] = index.id, index.trace, index.timecol
+            values["order"] = index.order, index.case_codes
+            self.timings["order"] = 0.0
+        for stage in self.plan():
+            if stage not in values:
+                start = time.perf_counter()
+                name, parametrized, parameter = stage.partition(":")
+                compute = getattr(self, "_" + name)
+                values[stage] = (compute(log, values, parameter) if parametrized
+                                 else compute(log, values))
+                self.timings[stage] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        order = values["order"][0]
+        keep = np.ones(len(order), dtype=bool)
+        for i in range(len(self.filters)):
+            keep &= values["filter:" + str(i)]
+
+        # rows without case id get no features
+        missing = len(order) < len(log)
+        columns = dict()
+        for feature in self.features:
+            computed = values[self._feature_stage(feature)]
+            if feature.startswith("Count "):
+                computed = self._case_values(values, computed)
+            column = (np.full(len(log), np.nan) if missing
+                      else np.empty(len(log), dtype=computed.dtype))
+            column[order] = computed
+            columns[feature] = column
+        if columns:
+            log = log.copy(deep=False)
+            log[list(columns)] = pd.DataFrame(columns, index=log.index)
+        if self.filters:
+            rows = np.zeros(len(log), dtype=bool)
+            rows[order[keep]] = True
+            log = log[rows]
+        self.timings["materialize"] = time.perf_counter() - start
+        return log
+
+    def summary(self) -> pd.DataFrame:
+        """Seconds spent per stage of the last run, slowest first."""
+        return (pd.DataFrame({"stage": list(self.timings), "seconds": list(self.timings.values())})
+                .sort_values("seconds", ascending=False, kind="stable").reset_index(drop=True))
+
+    @staticmethod
+    def _case_values(values: dict, per_case: np.ndarray) -> np.ndarray:
+        return per_case[values["groups"][2]]
+
+    # intermediate stages, computed on the rows sorted by case
+
+    def _order(self, log, values):
+        codes = pd.factorize(log[values["columns"][0]])[0]
+        order = np.argsort(codes, kind="stable")
+        order = order[codes[order] >= 0]
+        return order, codes[order]
+
+    def _groups(self, log, values):
+        cases = values["order"][1]
+        starts = np.flatnonzero(np.diff(cases, prepend=-1) != 0)
+        lengths = np.diff(np.append(starts, len(cases)))
+        return starts, lengths, np.repeat(np.arange(len(starts)), lengths)
+
+    def _times(self, log, values):
+        timestamps = pd.to_datetime(log[values["columns"][2]])
+        if timestamps.dt.tz is not None:
+            timestamps = timestamps.dt.tz_localize(None)
+        return timestamps.values.astype("datetime64[ns]")[values["order"][0]].view(np.int64)
+
+    def _to_next(self, log, values):
+        times = values["times"]
+        cases = values["order"][1]
+        is_last = np.ones(len(cases), dtype=bool)
+        is_last[:-1] = cases[1:] != cases[:-1]
+        return np.append(times[1:] - times[:-1], 0), is_last
+
+    def _case_start(self, log, values):
+        starts, _, group = values["groups"]
+        return values["times"][starts][group]
+
+    def _case_end(self, log, values):
+        starts, lengths, group = values["groups"]
+        return values["times"][starts + lengths - 1][group]
+
+    def _calendar(self, log, values):
+        return pd.DatetimeIndex(values["times"].view("datetime64[ns]"))
+
+    def _activities(self, log, values):
+        return log[values["columns"][1]].to_numpy()[values["order"][0]]
+
+    def _count(self, log, values, activity):
+        return np.bincount(values["groups"][2][values["activities"] == activity],
+                           minlength=len(values["groups"][0]))
+
+    # features
+
+    def _duration(self, log, values):
+        to_next, is_last = values["to_next"]
+        return np.where(is_last, np.nan, _hours(to_next))
+
+    def _time_since_last_event(self, log, values):
+        to_next, is_last = values["to_next"]
+        return np.where(np.roll(is_last, 1), 0, np.roll(to_next, 1) / 1e9)
+
+    def _time_since_first_event(self, log, values):
+        return (values["times"] - values["case_start"]) / 1e9
+
+    def _cumulative_duration(self, log, values):
+        to_next, is_last = values["to_next"]
+        return np.where(is_last, np.nan, _hours(values["times"] + to_next - values["case_start"]))
+
+    def _total_duration(self, log, values):
+        return _hours(values["case_end"] - values["case_start"])
+
+    def _remaining_time(self, log, values):
+        return _hours(values["case_end"] - values["times"])
+
+    def _year(self, log, values):
+        return values["calendar"].year.to_numpy()
+
+    def _month(self, log, values):
+        return values["calendar"].month.to_numpy()
+
+    def _weekday(self, log, values):
+        return values["calendar"].weekday.to_numpy()
+
+    def _hour(self, log, values):
+        return values["calendar"].hour.to_numpy()
+
+    def _event_nr(self, log, values):
+        starts, _, group = values["groups"]
+        return np.arange(len(group)) - starts[group] + 1
+
+    def _trace_length(self, log, values):
+        _, lengths, group = values["groups"]
+        return lengths[group]
+
+    # filters, keeping all rows of a case
+
+    def _filter(self, log, values, i):
+        kind, *args = self.filters[int(i)]
+        return getattr(self, "_keep_" + kind)(values, *args)
+
+    def _keep_min_activity(self, values, activity, min):
+        return self._case_values(values, values["count:" + activity]) >= min
+
+    def _keep_time_range(self, values, start, end):
+        return ((values["case_start"] <= _naive_ns(pd.Timestamp(end)))
+                & (values["case_end"] >= _naive_ns(pd.Timestamp(start))))
+
+    def _keep_trace_length(self, values, min, max):
+        lengths = self._case_values(values, values["groups"][1])
+        keep = np.ones(len(lengths), dtype=bool)
+        if min is not None:
+            keep &= lengths >= min
+        if max is not None:
+            keep &= lengths <= max
+        return keep
+
+
+def _naive_ns(timestamp: pd.Timestamp) -> int:
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.tz_localize(None)
+    return timestamp.value
@@ -0,0 +1,100 @@
+"""
+Prefixes of traces as slices into the events of a log.
+
+A prefix is the slice ``[start, start + length)`` of the event arrays sorted by
+case, so all prefixes of all cases share one copy of the events instead of
+expanding every case into its prefixes. Mini-batches of padded prefixes are
+gathered from the event arrays on demand, which also works on memory-mapped
+arrays written by ``log.to_npy``.
+"""
+import os
+
+import numpy as np
+
+
+class PrefixView(object):
+    """
+    Prefixes of the cases of event arrays sorted by case.
+
+    :param arrays: name and event array, e.g. x_num and x_cat, the events of case i
+    are ``arrays[name][offsets[i]:offsets[i + 1]]``
+    :param offsets: start of every case in the events followed by the number of events
+    :param targets: target of every case, the target of all its prefixes
+    :param cutoff: number of events per case prefixes are taken from, e.g. the y_pos of
+    prefix_reduction, defaults to all events; cases with a cutoff below ``min_length``
+    have no prefixes
+    :param min_length: length of the shortest prefix of a case
+    """
+
+    def __init__(self, arrays: dict, offsets: np.ndarray, targets=None, cutoff=None,
+                 min_length=1, case_ids=None):
+        self.arrays = dict(arrays)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.targets = None if targets is None else np.asarray(targets)
+        self.case_ids = case_ids
+        cutoff = np.diff(self.offsets) if cutoff is None else np.minimum(cutoff, np.diff(self.offsets))
+        n_prefixes = np.maximum(cutoff - min_length + 1, 0)
+        self.cases = np.repeat(np.arange(len(n_prefixes)), n_prefixes)
+        first = np.cumsum(n_prefixes) - n_prefixes
+        self.starts = self.offsets[self.cases]
+        self.lengths = np.arange(len(self.cases)) - first[self.cases] + min_length
+
+    @classmethod
+    def from_npy(cls, processed_path, min_length=1, mmap_mode='r'):
+        """Prefixes of the cases exported by ``log.to_npy``, memory-mapped by default."""
+        arrays = dict((name, np.load(os.path.join(processed_path, name + '.npy'), mmap_mode=mmap_mode))
+                      for name in ('x_num', 'x_cat', 'offsets', 'targets', 'case_ids')
+                      if os.path.exists(os.path.join(processed_path, name + '.npy')))
+        offsets = np.asarray(arrays.pop('offsets'))
+        return cls(arrays, offsets, targets=arrays.pop('targets', None), min_length=min_length,
+                   case_ids=arrays.pop('case_ids', None))
+
+    def __len__(self):
+        return len(self.cases)
+
+    def __getitem__(self, i) -> dict:
+        """Events of a prefix as views into the event arrays."""
+        start, stop = self.starts[i], self.starts[i] + self.lengths[i]
+        prefix = dict((name, values[start:stop]) for name, values in self.arrays.items())
+        if self.targets is not None:
+            prefix['y'] = self.targets[self.cases[i]]
+        return prefix
+
+    def batch(self, prefixes, padding='post', value=0) -> dict:
+        """
+        Padded events of the given prefixes.
+
+        :param prefixes: numbers of the prefixes
+        :param padding: 'post' pads after, 'pre' before the events of shorter prefixes
+        :return: name and array of shape (prefixes, longest prefix, ...) per event
+        array, lengths, case number and, if given, target y of every prefix
+        """
+        if padding not in ('pre', 'post'):
+            raise ValueError("padding must be 'pre' or 'post', got '" + str(padding) + "'")
+        prefixes = np.asarray(prefixes, dtype=np.int64)
+        lengths = self.lengths[prefixes]
+        width = int(lengths.max()) if len(prefixes) else 0
+        steps = np.arange(width)
+        if padding == 'pre':
+            steps = steps - (width - lengths)[:, None]
+        mask = (steps >= 0) & (steps < lengths[:, None])
+        events = np.where(mask, self.starts[prefixes][:, None] + steps, 0)
+
+        batch = dict()
+        for name, values in self.arrays.items():
+            padded = np.asarray(values[events.ravel()]).reshape(events.shape + values.shape[1:])
+            padded[~mask] = value
+            batch[name] = padded
+        batch['lengths'] = lengths
+        batch['case'] = self.cases[prefixes]
+        if self.targets is not None:
+            batch['y'] = self.targets[batch['case']]
+        return batch
+
+    def batches(self, batch_size=128, shuffle=False, seed=None, padding='post', value=0):
+        """Generate padded mini-batches of all prefixes, see ``batch``."""
+        prefixes = np.arange(len(self))
+        if shuffle:
+            np.random.default_rng(seed).shuffle(prefixes)
+        for start in range(0, len(prefixes), batch_size):
+            yield self.batch(prefixes[start:start + batch_size], padding=padding, value=value)
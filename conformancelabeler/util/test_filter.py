@@ -0,0 +1,40 @@
+from unittest import TestCase
+
+import pandas as pd
+
+from conformancelabeler.util import filter
+from conformancelabeler.util.trace_index import TraceIndex
+
+
+class TestFilter(TestCase):
+
+	def setUp(self):
+		traces = {'1': ['A', 'B'], '2': ['A', 'B', 'B'], '3': ['C'], '4': ['B', 'C', 'B', 'B']}
+		self.log = pd.DataFrame([(case_id, event) for case_id, events in traces.items() for event in events],
+								columns=['case:concept:name', 'concept:name'])
+
+	def cases(self, log):
+		return log['case:concept:name'].unique().tolist()
+
+	def test_sparse_counts(self):
+		index = TraceIndex(self.log)
+		indptr, cases, counts = index.sparse_counts
+		self.assertEqual(indptr.tolist(), [0, 2, 5, 7])
+		self.assertEqual(cases.tolist(), [0, 1, 0, 1, 3, 2, 3])
+		self.assertEqual(counts.tolist(), [1, 1, 1, 2, 3, 1, 1])
+		self.assertEqual(index.count_matrix.tolist(), [[1, 1, 0], [1, 2, 0], [0, 0, 1], [0, 3, 1]])
+
+	def test_filter_by_activity_count(self):
+		self.assertEqual(self.cases(filter.filter_by_min_activity(self.log, 'B', 2)), ['2', '4'])
+		self.assertEqual(self.cases(filter.filter_by_max_activity(self.log, 'B', 1)), ['1', '3'])
+		self.assertEqual(self.cases(filter.filter_by_activity_count(self.log, 'B', 1, 2)), ['1', '2'])
+		self.assertEqual(self.cases(filter.filter_by_min_activity(self.log, 'X', 0)), ['1', '2', '3', '4'])
+		kept = filter.filter_by_min_activity(self.log, 'A', 1)
+		pd.testing.assert_frame_equal(kept, self.log.iloc[:5])
+
+	def test_filter_contains(self):
+		self.assertEqual(self.cases(filter.filter_contains(self.log, ['B', 'C'])), ['4'])
+		self.assertEqual(self.cases(filter.filter_contains(self.log, ['A', 'C'], how='any')),
+						 ['1', '2', '3', '4'])
+		self.assertEqual(self.cases(filter.filter_not_contains(self.log, 'A')), ['3', '4'])
+		self.assertEqual(self.cases(filter.filter_contains(TraceIndex(self.log), 'C')), ['3', '4'])
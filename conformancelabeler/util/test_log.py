@@ -0,0 +1,97 @@
+import importlib.util
+import os
+import shutil
+import tempfile
+from unittest import TestCase, skipUnless
+
+import pandas as pd
+
+from conformancelabeler.util import log as logutils
+
+XES = '''<?xml version="1.0" encoding="UTF-8" ?>
+<log xes.version="1.0" xmlns="http://www.xes-standard.org/">
+	<string key="concept:name" value="log"/>
+	<trace>
+		<string key="concept:name" value="1"/>
+		<event><string key="concept:name" value="A"/><date key="time:timestamp" value="2019-01-01T10:00:00.000+01:00"/></event>
+		<event><string key="concept:name" value="B"/><date key="time:timestamp" value="2019-01-02T10:00:00.000+01:00"/></event>
+	</trace>
+	<trace>
+		<string key="concept:name" value="2"/>
+		<event><string key="concept:name" value="B"/><date key="time:timestamp" value="2019-01-03T10:00:00.000+01:00"/>
+		<int key="amount" value="3"/></event>
+	</trace>
+	<trace>
+		<string key="concept:name" value="3"/>
+		<event><string key="concept:name" value="A"/><date key="time:timestamp" value="2019-01-04T10:00:00.000+01:00"/></event>
+	</trace>
+</log>
+'''
+
+
+class TestLog(TestCase):
+
+	def setUp(self):
+		fd, self.path = tempfile.mkstemp(suffix='.xes')
+		with os.fdopen(fd, 'w') as f:
+			f.write(XES)
+
+	def tearDown(self):
+		os.remove(self.path)
+
+	def test_read_xes_chunks(self):
+		chunks = list(logutils.read_xes(self.path, chunksize=2))
+		self.assertEqual([chunk['case:concept:name'].tolist() for chunk in chunks], [['1', '1', '2'], ['3']])
+		self.assertEqual(chunks[0]['concept:name'].dtype, 'category')
+		self.assertEqual(str(chunks[0]['time:timestamp'].iloc[0]), '2019-01-01 09:00:00+00:00')
+		self.assertEqual(chunks[0]['amount'].iloc[2], 3)
+
+	@skipUnless(importlib.util.find_spec('pyarrow'), 'requires pyarrow')
+	def test_read_xes_cache(self):
+		cache_dir = tempfile.mkdtemp()
+		try:
+			log = logutils.read_xes(self.path, cache_dir=cache_dir)
+			self.assertEqual(len(os.listdir(cache_dir)), 1)
+			cached = logutils.read_xes(self.path, cache_dir=cache_dir)
+			self.assertEqual(cached['concept:name'].dtype, 'category')
+			self.assertEqual(cached['case:concept:name'].tolist(), log['case:concept:name'].tolist())
+			self.assertEqual(cached['time:timestamp'].tolist(), log['time:timestamp'].tolist())
+
+			with open(self.path, 'a') as f:
+				f.write('\n')
+			logutils.read_xes(self.path, cache_dir=cache_dir)
+			self.assertEqual(len(os.listdir(cache_dir)), 2)
+		finally:
+			shutil.rmtree(cache_dir)
+
+	def test_to_npy(self):
+		log = pd.DataFrame({'case:concept:name': ['2', '1', '2', '1', '1'], 'num': [0.5, 1., 1.5, 2., 2.5],
+							'cat': [1, 2, 1, 3, 1], 'y': [1, 0, 1, 0, 0]})
+		processed_path = tempfile.mkdtemp()
+		try:
+			logutils.to_npy(log, processed_path, ['num'], ['cat'])
+			arrays = logutils.read_npy(processed_path)
+			self.assertEqual(arrays['offsets'].tolist(), [0, 2, 5])
+			self.assertEqual(arrays['x_num'][:, 0].tolist(), [0.5, 1.5, 1., 2., 2.5])
+			self.assertEqual(arrays['x_cat'][2:5, 0].tolist(), [2, 3, 1])
+			self.assertEqual(arrays['targets'].tolist(), [1, 0])
+			self.assertEqual(arrays['case_ids'].tolist(), ['2', '1'])
+			other = log.assign(num=log['num'] * 2, y=1 - log['y'])
+			logutils.to_npy(other, processed_path, ['num'], ['cat'])
+			arrays = logutils.read_npy(processed_path)
+			self.assertEqual(arrays['x_num'][:, 0].tolist(), [1., 3., 2., 4., 5.])
+			self.assertEqual(arrays['targets'].tolist(), [0, 1])
+		finally:
+			shutil.rmtree(processed_path)
+
+	def test_compact(self):
+		log = pd.DataFrame({'case:concept:name': ['1', '1', '2'], 'concept:name': ['A', 'B', 'A'],
+							'time:timestamp': ['2019-01-01T10:00:00+01:00'] * 3, 'amount': [1, 300, 2],
+							'cost': [0.5, 1.25, 2.0], 'exact': [0.1, 0.2, 0.3]})
+		compact = logutils.compact(log)
+		self.assertEqual(compact['concept:name'].dtype, 'category')
+		self.assertEqual(compact['amount'].dtype, 'int16')
+		self.assertEqual(compact['cost'].dtype, 'float32')
+		self.assertEqual(compact['exact'].dtype, 'float64')
+		self.assertEqual(str(compact['time:timestamp'].iloc[0]), '2019-01-01 09:00:00+00:00')
+		self.assertEqual(compact[compact['concept:name'] == 'A']['case:concept:name'].tolist(), ['1', '2'])
@@ -0,0 +1,55 @@
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from conformancelabeler.util import metrics
+from conformancelabeler.util.metrics import compute_time_features
+from conformancelabeler.util.trace_index import TraceIndex
+
+
+class TestMetrics(TestCase):
+
+	def setUp(self):
+		self.log = pd.DataFrame({'case:concept:name': ['1', '2', '1', '2', '1'],
+								 'time:timestamp': pd.to_datetime(['2021-01-01 10:00', '2021-01-02 08:00',
+																   '2021-01-01 12:00', '2021-01-02 09:00',
+																   '2021-01-01 13:00']).tz_localize('UTC')})
+
+	def test_compute_time_features(self):
+		log = compute_time_features(self.log.copy())
+		case = log[log['case:concept:name'] == '1']
+		self.assertEqual(case['time_since_first_event'].tolist(), [0, 7200, 10800])
+		self.assertEqual(case['remaining_time'].tolist(), [3, 1, 0])
+		self.assertEqual(case['event_nr'].tolist(), [1, 2, 3])
+		np.testing.assert_array_equal(case['duration'], [2, 1, np.nan])
+		np.testing.assert_array_equal(case['cumulative_duration'], [2, 3, np.nan])
+		self.assertEqual(log['total_duration'].tolist(), [3, 1, 3, 1, 3])
+		self.assertEqual(log['hour'].tolist(), [10, 8, 12, 9, 13])
+
+	def test_compute_time_features_selected(self):
+		log = compute_time_features(self.log.copy(), features=['trace_length'])
+		self.assertEqual(log.columns.tolist(), ['case:concept:name', 'time:timestamp', 'trace_length'])
+		self.assertEqual(log['trace_length'].tolist(), [3, 2, 3, 2, 3])
+		self.assertEqual(str(log['time:timestamp'].dt.tz), 'UTC')
+		with self.assertRaises(ValueError):
+			compute_time_features(self.log, features=['weekday', 'age'])
+
+	def test_compute_time_features_index_columns(self):
+		log = self.log.rename(columns={'case:concept:name': 'cid', 'time:timestamp': 'ts'}).assign(act='A')
+		index = TraceIndex(log, 'cid', 'act', 'ts')
+		features = compute_time_features(index, features=['time_since_first_event', 'trace_length'])
+		self.assertEqual(features['time_since_first_event'].tolist(), [0, 0, 7200, 3600, 10800])
+		self.assertEqual(features['trace_length'].tolist(), [3, 2, 3, 2, 3])
+
+	def test_features_return_new_frames(self):
+		log = self.log.assign(**{'concept:name': ['A', 'B', 'A', 'A', 'B']})
+		columns = log.columns.tolist()
+		for source in (log, TraceIndex(log)):
+			self.assertEqual(metrics.get_activity_count(source, 'A')['Count A'].tolist(), [2, 1, 2, 1, 2])
+			self.assertEqual(metrics.get_seq_length(source)['trace_length'].tolist(), [3, 2, 3, 2, 3])
+			self.assertEqual(metrics.get_event_nr(source)['event_nr'].tolist(), [1, 1, 2, 2, 3])
+			self.assertIn('duration', metrics.get_event_duration(source).columns)
+			compute_time_features(source, features=['hour'])
+			self.assertEqual(log.columns.tolist(), columns)
+			self.assertEqual(str(log['time:timestamp'].dt.tz), 'UTC')
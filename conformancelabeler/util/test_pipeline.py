@@ -0,0 +1,37 @@
+from unittest import TestCase
+
+import pandas as pd
+
+from conformancelabeler.util.pipeline import FeaturePipeline
+
+
+class TestFeaturePipeline(TestCase):
+
+	def setUp(self):
+		self.log = pd.DataFrame({'case:concept:name': ['1', '2', '1', '2', '1', '3'],
+								 'concept:name': ['A', 'A', 'B', 'C', 'B', 'B'],
+								 'time:timestamp': pd.to_datetime(['2021-01-01 10:00', '2021-02-02 08:00',
+																   '2021-01-01 12:00', '2021-02-02 09:00',
+																   '2021-01-01 13:00', '2021-03-01 10:00'])})
+
+	def test_plan(self):
+		pipeline = FeaturePipeline().add('total_duration', 'remaining_time', 'hour').count('B')
+		pipeline.filter_min_activity('B', 1)
+		plan = pipeline.plan()
+		self.assertEqual(len(plan), len(set(plan)))
+		self.assertLess(plan.index('case_end'), plan.index('remaining_time'))
+		self.assertEqual(plan.count('count:B'), 1)
+
+	def test_run(self):
+		pipeline = (FeaturePipeline().add('remaining_time').count('B')
+					.filter_min_activity('B', 1).filter_time_range('2021-01-01', '2021-02-15'))
+		log = pipeline.run(self.log.copy())
+		self.assertEqual(log['case:concept:name'].tolist(), ['1', '1', '1'])
+		self.assertEqual(log['remaining_time'].tolist(), [3, 1, 0])
+		self.assertEqual(log['Count B'].tolist(), [2, 2, 2])
+		self.assertEqual(set(pipeline.timings), set(pipeline.plan()) | {'materialize'})
+
+	def test_filter_trace_length(self):
+		log = FeaturePipeline().filter_trace_length(min=2).run(self.log.copy())
+		self.assertEqual(log['case:concept:name'].tolist(), ['1', '2', '1', '2', '1'])
+		self.assertEqual(log.columns.tolist(), self.log.columns.tolist())
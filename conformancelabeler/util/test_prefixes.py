@@ -0,0 +1,49 @@
+import tempfile
+from unittest import TestCase
+
+import numpy as np
+import pandas as pd
+
+from conformancelabeler.util.log import to_npy
+from conformancelabeler.util.prefixes import PrefixView
+
+
+class TestPrefixView(TestCase):
+
+	def setUp(self):
+		self.x = np.arange(1, 8).reshape(-1, 1)
+		self.view = PrefixView({'x': self.x}, offsets=[0, 3, 4, 7], targets=[1, 0, 2], cutoff=[3, 1, 2],
+							   min_length=2)
+
+	def test_prefixes(self):
+		self.assertEqual(len(self.view), 3)
+		self.assertEqual(self.view.starts.tolist(), [0, 0, 4])
+		self.assertEqual(self.view.lengths.tolist(), [2, 3, 2])
+		prefix = self.view[1]
+		self.assertEqual(prefix['x'].ravel().tolist(), [1, 2, 3])
+		self.assertEqual(prefix['y'], 1)
+		self.assertTrue(np.shares_memory(prefix['x'], self.x))
+
+	def test_batches(self):
+		batches = list(self.view.batches(batch_size=2))
+		self.assertEqual(len(batches), 2)
+		self.assertEqual(batches[0]['x'][..., 0].tolist(), [[1, 2, 0], [1, 2, 3]])
+		self.assertEqual(batches[0]['y'].tolist(), [1, 1])
+		self.assertEqual(batches[1]['x'][..., 0].tolist(), [[5, 6]])
+		self.assertEqual(batches[1]['case'].tolist(), [2])
+		pre = self.view.batch([0, 1], padding='pre', value=-1)
+		self.assertEqual(pre['x'][..., 0].tolist(), [[-1, 1, 2], [1, 2, 3]])
+		shuffled = np.concatenate([b['lengths'] for b in self.view.batches(batch_size=2, shuffle=True, seed=0)])
+		self.assertEqual(sorted(shuffled.tolist()), [2, 2, 3])
+
+	def test_from_npy(self):
+		log = pd.DataFrame({'case:concept:name': ['a', 'b', 'a', 'a'], 'num': [1., 2., 3., 4.],
+							'cat': [1, 2, 1, 3], 'y': [1, 0, 1, 1]})
+		with tempfile.TemporaryDirectory() as path:
+			to_npy(log, path, ['num'], ['cat'])
+			view = PrefixView.from_npy(path)
+			self.assertEqual(len(view), 4)
+			batch = view.batch(np.arange(4))
+			self.assertEqual(batch['x_num'][..., 0].tolist(), [[1, 0, 0], [1, 3, 0], [1, 3, 4], [2, 0, 0]])
+			self.assertEqual(batch['y'].tolist(), [1, 1, 1, 0])
+			del view, batch
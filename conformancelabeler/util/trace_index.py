@@ -0,0 +1,382 @@
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+# bases of the polynomial hashes identifying trace variants
+_VARIANT_BASES = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F))
+
+
+def fingerprint(log: pd.DataFrame, columns: list) -> str:
+    """Hash of the length and the values of the given columns of a log."""
+    digest = hashlib.blake2b(str(len(log)).encode(), digest_size=16)
+    for col in columns:
+        digest.update(pd.util.hash_pandas_object(log[col], index=False).values.tobytes())
+    return digest.hexdigest()
+
+
+def _signature(log: pd.DataFrame, columns: list) -> tuple:
+    """
+    Length, dtypes and memory of the given columns of a log, without reading their values.
+
+    A column replaced by assignment gets new memory and a new signature, values
+    changed in place keep it.
+
+    :return: signature and the column arrays, kept alive so their ids stay unique
+    """
+    signature = [len(log)]
+    arrays = list()
+    for col in columns:
+        array = log[col].array
+        data = getattr(array, "_ndarray", None)
+        if isinstance(data, np.ndarray):
+            signature.append((str(array.dtype), data.__array_interface__["data"][0], data.strides))
+        else:
+            signature.append((str(array.dtype), id(array)))
+            arrays.append(array)
+    return tuple(signature), arrays
+
+
+class TraceIndex(object):
+    """
+    Compiled, reusable index over the traces of an event log.
+
+    Events are sorted once by case (stable, so the order of events within a case
+    is kept) and activities are replaced by integer codes. The index holds the case
+    offsets into the sorted events, the int-coded activities and a per case bitmap
+    of the occurring activities. Per case quantities are computed with grouped
+    array operations over the sorted events.
+
+    The index keeps a fingerprint of the case and activity columns it was built
+    from. ``is_current`` only compares the length, dtypes and memory of these
+    columns and notices columns that were replaced, ``refresh`` hashes the columns
+    again and also notices values changed in place.
+    """
+
+    def __init__(self, log: pd.DataFrame, id_col="case:concept:name",
+                 activity_col="concept:name",
+                 timestamp_col="time:timestamp"):
+        self.log = log
+        self.id = id_col
+        self.trace = activity_col
+        self.timecol = timestamp_col
+        self._build()
+
+    @classmethod
+    def from_arrays(cls, activity_codes: np.ndarray, offsets: np.ndarray, activities,
+                    case_ids=None, times=None):
+        """
+        Index over already encoded traces without a source log.
+
+        :param activity_codes: activity codes of the events sorted by case
+        :param offsets: start of every case in the events followed by the number of events
+        :param activities: activity of every code
+        :param case_ids: id of every case, defaults to the case number
+        :param times: timestamps of the events sorted by case in int64 nanoseconds
+        """
+        index = cls.__new__(cls)
+        index.log = None
+        index.id = index.trace = index.timecol = None
+        index.fingerprint = None
+        index.activities = pd.Index(activities)
+        index.case_ids = pd.RangeIndex(len(offsets) - 1) if case_ids is None else pd.Index(case_ids)
+        index.activity_codes = np.asarray(activity_codes)
+        index._compile(np.asarray(offsets, dtype=np.int64))
+        index.order = np.arange(len(index.activity_codes))
+        index.row_case_codes = index.case_codes
+        index._times = None if times is None else np.asarray(times, dtype=np.int64)
+        return index
+
+    def _build(self):
+        log = self.log
+        self.fingerprint = fingerprint(log, [self.id, self.trace])
+        self._columns = _signature(log, [self.id, self.trace])
+        self._time_state = None
+        case_codes, self.case_ids = pd.factorize(log[self.id], sort=True)
+        self.row_case_codes = case_codes
+        activity_codes, self.activities = pd.factorize(log[self.trace])
+        order = np.argsort(case_codes, kind="stable")
+        order = order[case_codes[order] >= 0]
+        self.order = order
+        self.activity_codes = activity_codes[order]
+        offsets = np.zeros(len(self.case_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(case_codes[order], minlength=len(self.case_ids)), out=offsets[1:])
+        self._compile(offsets)
+
+    def _compile(self, offsets: np.ndarray):
+        self.offsets = offsets
+        self.n_cases = len(offsets) - 1
+        self.lengths = np.diff(offsets)
+        self.case_codes = np.repeat(np.arange(self.n_cases), self.lengths)
+        self.positions = np.arange(len(self.case_codes)) - offsets[self.case_codes]
+
+        self.bitmap = np.zeros((self.n_cases, (len(self.activities) + 7) // 8), dtype=np.uint8)
+        known = self.activity_codes >= 0
+        codes = self.activity_codes[known]
+        np.bitwise_or.at(self.bitmap, (self.case_codes[known], codes >> 3),
+                         (1 << (codes & 7)).astype(np.uint8))
+        self._count_matrix = None
+        self._sparse_counts = None
+        self._by_activity = None
+        self._variants = None
+
+    def event_times(self) -> np.ndarray:
+        """
+        Timestamps of the events sorted by case as int64 nanoseconds.
+
+        Time zone aware timestamps are converted to their local wall time. The
+        timestamps are converted once and again only after the timestamp column
+        was replaced or ``refresh`` was called.
+        """
+        if self.log is None:
+            if self._times is None:
+                raise ValueError("Index built without timestamps")
+            return self._times
+        return self._times_of_log()[1]
+
+    @property
+    def time_fingerprint(self) -> str:
+        """Fingerprint of the timestamp column, computed once like ``event_times``."""
+        if self.log is None:
+            return None
+        signature, times, digest = self._times_of_log()
+        if digest is None:
+            digest = fingerprint(self.log, [self.timecol])
+            self._time_state = signature, times, digest
+        return digest
+
+    def _times_of_log(self) -> tuple:
+        """Signature of the timestamp column, event times and fingerprint if computed yet."""
+        state = self._time_state
+        signature = _signature(self.log, [self.timecol])
+        if state is None or state[0][0] != signature[0]:
+            times = pd.to_datetime(self.log[self.timecol])
+            if times.dt.tz is not None:
+                times = times.dt.tz_localize(None)
+            times = times.values.astype("datetime64[ns]").view(np.int64)[self.order]
+            times.flags.writeable = False
+            state = self._time_state = signature, times, None
+        return state
+
+    def is_current(self) -> bool:
+        """Whether the case and activity columns of the source log were not replaced."""
+        if self.log is None:
+            return True
+        return _signature(self.log, [self.id, self.trace])[0] == self._columns[0]
+
+    def validate(self):
+        """Rebuild the index if the case or activity columns were replaced, see ``is_current``."""
+        if not self.is_current():
+            self._build()
+        return self
+
+    def refresh(self):
+        """
+        Rebuild the index if the case or activity values of the source log changed.
+
+        Timestamps are converted again on their next use.
+        """
+        if self.log is not None and (not self.is_current()
+                                     or fingerprint(self.log, [self.id, self.trace]) != self.fingerprint):
+            self._build()
+        self._time_state = None
+        return self
+
+    def code(self, activity) -> int:
+        """Integer code of an activity, -1 if it does not occur in the log."""
+        try:
+            return int(self.activities.get_loc(activity))
+        except KeyError:
+            return -1
+
+    def contains(self, activity) -> np.ndarray:
+        """Whether ``activity`` occurs in a case, looked up in the bitmap."""
+        code = self.code(activity)
+        if code < 0:
+            return np.zeros(self.n_cases, dtype=bool)
+        return (self.bitmap[:, code >> 3] & (1 << (code & 7))) > 0
+
+    def is_activity(self, activity) -> np.ndarray:
+        code = self.code(activity)
+        if code < 0:
+            return np.zeros(len(self.activity_codes), dtype=bool)
+        return self.activity_codes == code
+
+    def first_position(self, mask: np.ndarray, missing=-1) -> np.ndarray:
+        """Position of the first event per case for which ``mask`` holds."""
+        first = np.full(self.n_cases, missing, dtype=np.int64)
+        idx = np.flatnonzero(mask)
+        if len(idx):
+            cases = self.case_codes[idx]
+            keep = np.ones(len(idx), dtype=bool)
+            keep[1:] = cases[1:] != cases[:-1]
+            first[cases[keep]] = self.positions[idx[keep]]
+        return first
+
+    def last_position(self, mask: np.ndarray, missing=-1) -> np.ndarray:
+        """Position of the last event per case for which ``mask`` holds."""
+        last = np.full(self.n_cases, missing, dtype=np.int64)
+        idx = np.flatnonzero(mask)
+        if len(idx):
+            cases = self.case_codes[idx]
+            keep = np.ones(len(idx), dtype=bool)
+            keep[:-1] = cases[:-1] != cases[1:]
+            last[cases[keep]] = self.positions[idx[keep]]
+        return last
+
+    def grouped_cumsum(self, values: np.ndarray) -> np.ndarray:
+        """Cumulative sum of ``values`` restarting at every case."""
+        cumsum = np.cumsum(values)
+        if not len(cumsum):
+            return cumsum
+        starts = self.offsets[:-1]
+        return cumsum - (cumsum[starts] - values[starts])[self.case_codes]
+
+    def grouped_max(self, values: np.ndarray) -> np.ndarray:
+        if not self.n_cases:
+            return np.zeros(0, dtype=values.dtype)
+        return np.maximum.reduceat(values, self.offsets[:-1])
+
+    @property
+    def sparse_counts(self) -> tuple:
+        """
+        Occurrences of every activity per case as a sparse matrix, computed once.
+
+        Column compressed by activity: the cases containing the activity with code
+        ``c`` are ``cases[indptr[c]:indptr[c + 1]]`` in ascending order, occurring
+        ``counts[indptr[c]:indptr[c + 1]]`` times.
+
+        :return: indptr, cases, counts
+        """
+        if self._sparse_counts is None:
+            events, bounds, _ = self._group_by_activity()
+            events = events[bounds[0]:]
+            codes = self.activity_codes[events]
+            cases = self.case_codes[events]
+            starts = np.ones(len(events), dtype=bool)
+            starts[1:] = (codes[1:] != codes[:-1]) | (cases[1:] != cases[:-1])
+            starts = np.flatnonzero(starts)
+            counts = np.diff(np.append(starts, len(events))).astype(np.int32)
+            indptr = np.searchsorted(codes[starts], np.arange(len(self.activities) + 1))
+            self._sparse_counts = indptr, cases[starts], counts
+        return self._sparse_counts
+
+    @property
+    def count_matrix(self) -> np.ndarray:
+        """Occurrences of every activity (columns) per case (rows), computed once."""
+        if self._count_matrix is None:
+            indptr, cases, counts = self.sparse_counts
+            matrix = np.zeros((self.n_cases, len(self.activities)), dtype=np.int32)
+            matrix[cases, np.repeat(np.arange(len(self.activities)), np.diff(indptr))] = counts
+            self._count_matrix = matrix
+        return self._count_matrix
+
+    def activity_counts(self, activity) -> np.ndarray:
+        """Occurrences of ``activity`` per case."""
+        counts = np.zeros(self.n_cases, dtype=np.int32)
+        code = self.code(activity)
+        if code >= 0:
+            indptr, cases, occurrences = self.sparse_counts
+            counts[cases[indptr[code]:indptr[code + 1]]] = occurrences[indptr[code]:indptr[code + 1]]
+        return counts
+
+    def _group_by_activity(self):
+        if self._by_activity is None:
+            events = np.argsort(self.activity_codes, kind="stable")
+            codes = self.activity_codes[events]
+            bounds = np.searchsorted(codes, np.arange(len(self.activities) + 1))
+            # occurrence number of every event among the events of its activity in its case
+            key = codes * max(self.n_cases, 1) + self.case_codes[events]
+            starts = np.ones(len(events), dtype=bool)
+            starts[1:] = key[1:] != key[:-1]
+            group_start = np.maximum.accumulate(np.where(starts, np.arange(len(events)), 0))
+            ranks = np.empty(len(events), dtype=np.int64)
+            ranks[events] = np.arange(len(events)) - group_start + 1
+            self._by_activity = events, bounds, ranks
+        return self._by_activity
+
+    def activity_events(self, activity) -> np.ndarray:
+        """Events of ``activity`` ordered by case and position."""
+        code = self.code(activity)
+        if code < 0:
+            return np.zeros(0, dtype=np.int64)
+        events, bounds, _ = self._group_by_activity()
+        return events[bounds[code]:bounds[code + 1]]
+
+    @property
+    def occurrence_ranks(self) -> np.ndarray:
+        """Per event, how often its activity occurred in its case up to and including it."""
+        return self._group_by_activity()[2]
+
+    def variants(self):
+        """
+        Index over the distinct traces and the variant of every case, computed once.
+
+        Traces are grouped by their length and two polynomial hashes of their
+        activity codes first. Every case is then compared with the first case of
+        its group and cases of colliding traces are split off by their exact
+        activity codes. Variants are numbered in order of their first case.
+        """
+        if self._variants is None:
+            codes = (self.activity_codes + 2).astype(np.uint64)
+            keys = [self.lengths.astype(np.uint64)]
+            max_length = int(self.lengths.max()) if self.n_cases else 0
+            for base in _VARIANT_BASES:
+                powers = np.cumprod(np.full(max_length, base, dtype=np.uint64))
+                keys.append(np.add.reduceat(codes * powers[self.positions], self.offsets[:-1])
+                            if self.n_cases else np.zeros(0, dtype=np.uint64))
+            keys = np.stack(keys, axis=1)
+            _, first, members = np.unique(keys, axis=0, return_index=True, return_inverse=True)
+            representative = first[members.reshape(-1)]
+            events = self.offsets[representative][self.case_codes] + self.positions
+            collided = np.bincount(self.case_codes[self.activity_codes != self.activity_codes[events]],
+                                   minlength=self.n_cases) > 0
+            if collided.any():
+                exact = np.zeros(self.n_cases, dtype=np.uint64)
+                traces = dict()
+                for case in np.flatnonzero(collided):
+                    trace = self.activity_codes[self.offsets[case]:self.offsets[case + 1]].tobytes()
+                    exact[case] = traces.setdefault(trace, len(traces) + 1)
+                _, first, members = np.unique(np.column_stack([keys, exact]), axis=0,
+                                              return_index=True, return_inverse=True)
+            order = np.argsort(first)
+            rank = np.empty_like(order)
+            rank[order] = np.arange(len(order))
+            members = rank[members.reshape(-1)]
+            cases = first[order]
+
+            lengths = self.lengths[cases]
+            offsets = np.zeros(len(cases) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=offsets[1:])
+            variant = np.repeat(np.arange(len(cases)), lengths)
+            events = self.offsets[cases][variant] + np.arange(offsets[-1]) - offsets[variant]
+            index = TraceIndex.from_arrays(self.activity_codes[events], offsets, self.activities,
+                                           case_ids=self.case_ids[cases])
+            self._variants = index, members
+        return self._variants
+
+    def split(self) -> list:
+        """Activity codes of every case."""
+        return np.split(self.activity_codes, self.offsets[1:-1])
+
+    def to_case_dict(self, violated: np.ndarray, positions: np.ndarray) -> dict:
+        return dict(zip(self.case_ids[violated].tolist(), positions[violated].tolist()))
+
+    def broadcast(self, values: np.ndarray, fill=np.nan) -> np.ndarray:
+        """Map per case ``values`` back onto the rows of the indexed log."""
+        rows = values[self.row_case_codes]
+        missing = self.row_case_codes < 0
+        if missing.any():
+            rows = rows.astype(np.result_type(rows.dtype, np.min_scalar_type(fill)))
+            rows[missing] = fill
+        return rows
+
+    def event_positions(self, fill=np.nan) -> np.ndarray:
+        """Position of every row of the indexed log within its case."""
+        rows = np.full(len(self.row_case_codes), -1, dtype=np.int64)
+        rows[self.order] = self.positions
+        if (self.row_case_codes < 0).any():
+            rows = rows.astype(float)
+            rows[self.row_case_codes < 0] = fill
+        return rows